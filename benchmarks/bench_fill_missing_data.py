@@ -0,0 +1,107 @@
+"""量測 `DatabaseManager.fill_missing_data` 經由 DataLoader 讀取資料庫時的延遲 (p50 / p99)
+
+執行：`python -m benchmarks.bench_fill_missing_data`，預設使用記憶體資料庫，可用 `DATABASE_URL` 指定其他資料庫
+每次呼叫前清空快取與伺服器設定快照，所有欄位都從資料庫讀取
+- sequential：逐一呼叫 `CALLS` 次
+- concurrent：每次同時發出 `CONCURRENCY` 個不同使用者的呼叫，量測每個呼叫的延遲
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import asyncio
+import logging
+import statistics
+import time
+
+from database import (
+    Database,
+    RowCache,
+    User,
+    UserConfiguration,
+    UserRecord,
+    Server,
+    ServerConfiguration,
+    ServerTags,
+    Group,
+    WhiteList,
+    BlackList,
+)
+from managers.database_manager import DatabaseManager
+
+USERS = 1_000
+GUILD_ID = 1
+CALLS = 2_000
+CONCURRENCY = 50
+
+FIELDS = {
+    1: ("user_config",),
+    4: ("group", "user_record", "user_config", "server_config"),
+    7: ("group", "user_record", "user_config", "server_config", "server_tags", "black_list", "white_list"),
+}
+
+
+async def _seed() -> None:
+    await Database.upsert(Server, {"server_id": GUILD_ID, "name": "bench"})
+    await Database.upsert(ServerConfiguration, {"server_id": GUILD_ID})
+    await Database.upsert(ServerTags, {"server_id": GUILD_ID})
+    await Database.bulk_upsert(User, ({"discord_id": i, "name": None} for i in range(USERS)))
+    await Database.bulk_upsert(UserConfiguration, ({"discord_id": i} for i in range(USERS)))
+    await Database.bulk_upsert(UserRecord, ({"discord_id": i} for i in range(USERS)))
+    await Database.bulk_upsert(WhiteList, ({"user_id": i, "discord_id": (i + 1) % USERS} for i in range(USERS)))
+    await Database.bulk_upsert(BlackList, ({"user_id": i, "discord_id": (i + 2) % USERS} for i in range(USERS)))
+    await Database.bulk_upsert(
+        Group,
+        (
+            {
+                "server_id": GUILD_ID,
+                "owner_id": i,
+                "voice_channel_id": 10_000 + i,
+                "thread_id": 20_000 + i,
+                "description_message_id": 30_000 + i,
+            }
+            for i in range(0, USERS, 10)
+        ),
+    )
+
+
+def _clear_caches() -> None:
+    for table in RowCache.key_columns:
+        Database.cache.invalidate_table(table)
+    for table in Database.guild_configs.tables:
+        Database.guild_configs.discard(table)
+
+
+async def _call(user_id: int, fields: tuple[str, ...]) -> float:
+    start = time.perf_counter()
+    await DatabaseManager.fill_missing_data(user_id=user_id, guild_id=GUILD_ID, **dict.fromkeys(fields))
+    return time.perf_counter() - start
+
+
+def _percentiles(samples: list[float]) -> str:
+    quantiles = statistics.quantiles(samples, n=100)
+    return f"{quantiles[49] * 1000:>8.2f}{quantiles[98] * 1000:>8.2f}"
+
+
+async def main() -> None:
+    await Database.init()
+    await _seed()
+    print(f"{'fields':<8}{'mode':<12}{'p50 ms':>8}{'p99 ms':>8}")
+    for count, fields in FIELDS.items():
+        samples = []
+        for i in range(CALLS):
+            _clear_caches()
+            samples.append(await _call(i % USERS, fields))
+        print(f"{count:<8}{'sequential':<12}{_percentiles(samples)}")
+
+        samples = []
+        for i in range(0, CALLS, CONCURRENCY):
+            _clear_caches()
+            samples.extend(await asyncio.gather(*(_call((i + j) % USERS, fields) for j in range(CONCURRENCY))))
+        print(f"{count:<8}{'concurrent':<12}{_percentiles(samples)}")
+    await Database.close()
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    asyncio.run(main())
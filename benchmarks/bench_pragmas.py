@@ -0,0 +1,71 @@
+"""比較 SQLite 預設設定與 `SQLITE_PRAGMAS` 的寫入、讀取速度
+
+執行：`python -m benchmarks.bench_pragmas [資料庫檔案目錄]`，每種設定各使用一個新的資料庫檔案
+- 寫入：`WRITES` 個各自提交的單筆 upsert 交易 (對應一次設定儲存)
+- 讀取：`READS` 次以 Primary Key 讀取單筆資料
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import Base, User, UserConfiguration
+from database.app import SQLITE_PRAGMAS, _apply_sqlite_pragmas
+
+WRITES = 2_000
+READS = 20_000
+
+
+async def _run(path: Path, pragmas: bool) -> tuple[float, float]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    if pragmas:
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(sqlalchemy.insert(User), [{"discord_id": i} for i in range(WRITES)])
+
+    table = UserConfiguration.__table__
+    stmt = sqlite.insert(table)
+    stmt = stmt.on_conflict_do_update(index_elements=["discord_id"], set_={"limit_mode": stmt.excluded.limit_mode})
+    start = time.perf_counter()
+    for i in range(WRITES):
+        async with engine.begin() as connection:
+            await connection.execute(stmt, {"discord_id": i, "limit_mode": 1, "user_limit": 0})
+    writes = time.perf_counter() - start
+
+    select = sqlalchemy.select(table).where(table.c.discord_id == sqlalchemy.bindparam("id"))
+    start = time.perf_counter()
+    async with engine.connect() as connection:
+        for i in range(READS):
+            (await connection.execute(select, {"id": i % WRITES})).one()
+    reads = time.perf_counter() - start
+    await engine.dispose()
+    return writes, reads
+
+
+async def main(directory: str) -> None:
+    print("PRAGMA:", ", ".join(f"{name}={value}" for name, value in SQLITE_PRAGMAS.items()))
+    print(f"{'profile':<10}{'writes/s':>12}{'reads/s':>12}")
+    for name, pragmas in (("default", False), ("pragmas", True)):
+        path = Path(directory) / f"bench_pragmas_{name}.db"
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+        writes, reads = await _run(path, pragmas)
+        print(f"{name:<10}{WRITES / writes:>12.0f}{READS / reads:>12.0f}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else directory))
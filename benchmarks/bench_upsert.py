@@ -0,0 +1,64 @@
+"""比較 `session.merge` 與 `Database.bulk_upsert` 寫入 `UserConfiguration`、`UserRecord` 的速度
+
+執行：`python -m benchmarks.bench_upsert`，預設使用記憶體資料庫，可用 `DATABASE_URL` 指定其他資料庫
+每個筆數各量測兩次：第一次全部為新資料 (INSERT)，第二次全部為既有資料 (UPDATE)
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import asyncio
+import logging
+import time
+
+import sqlalchemy
+
+from database import Database, User, UserConfiguration, UserRecord
+
+SIZES = (10_000, 100_000)
+
+
+def _rows(table: type, size: int, generation: int) -> list:
+    if table is UserConfiguration:
+        return [UserConfiguration(discord_id=i, limit_mode=generation % 4) for i in range(size)]
+    return [UserRecord(discord_id=i, group_name=f"g{generation}") for i in range(size)]
+
+
+async def _merge(table: type, size: int, generation: int) -> None:
+    """舊的 `insert_or_replace`：同一個 session 內逐筆 merge (每筆先 SELECT 再 INSERT/UPDATE)"""
+    async with Database.sessionmaker() as session:
+        for row in _rows(table, size, generation):
+            await session.merge(row)
+        await session.commit()
+
+
+async def _upsert(table: type, size: int, generation: int) -> None:
+    await Database.bulk_upsert(table, _rows(table, size, generation))
+
+
+async def _reset(size: int) -> None:
+    async with Database.transaction() as transaction:
+        for table in (UserConfiguration, UserRecord, User):
+            await transaction.delete(table, sqlalchemy.true())
+    await Database.bulk_upsert(User, ({"discord_id": i, "name": None} for i in range(size)))
+
+
+async def main() -> None:
+    await Database.init()
+    print(f"{'table':<20}{'rows':>8}{'method':>8}{'insert':>10}{'update':>10}")
+    for size in SIZES:
+        for table in (UserConfiguration, UserRecord):
+            for name, method in (("merge", _merge), ("upsert", _upsert)):
+                await _reset(size)
+                timings = []
+                for generation in (1, 2):
+                    start = time.perf_counter()
+                    await method(table, size, generation)
+                    timings.append(time.perf_counter() - start)
+                print(f"{table.__tablename__:<20}{size:>8}{name:>8}{timings[0]:>9.2f}s{timings[1]:>9.2f}s", flush=True)
+    await Database.close()
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    asyncio.run(main())
@@ -9,6 +9,8 @@ from database import Database, WhiteList, BlackList, ServerConfiguration, Server
 
 from utility import SlashCommandLogger, LOG, config, steam_API
 
+from managers import DatabaseManager
+
 
 
 
@@ -34,7 +36,12 @@ class AdminCommandsCog(commands.Cog):
         except steam_API.SteamNetworkError:
             await interaction.response.send_message("❌ 錯誤: Steam 網路錯誤", ephemeral=True, )
         else:
-            server_config = await Database.select_one(ServerConfiguration, ServerConfiguration.server_id.is_(interaction.guild.id))
+            filled_data = await DatabaseManager.fill_missing_data(
+                guild_id=interaction.guild.id,
+                user_id=interaction.user.id,
+                server_config=None,
+            )
+            server_config: ServerConfiguration = filled_data.server_config
             server_config.steamAPI_key = API_key
             await Database.insert_or_replace(server_config)
             await interaction.response.send_message(f"✅ 已成功設定API key `{API_key}`", ephemeral=True, )
@@ -48,8 +55,14 @@ class AdminCommandsCog(commands.Cog):
     ):
         guild = interaction.guild
         await interaction.response.defer(ephemeral=True)
-        server_config = await Database.select_one(ServerConfiguration, ServerConfiguration.server_id.is_(guild.id))
-        server_tags = await Database.select_one(ServerTags, ServerTags.server_id.is_(guild.id))
+        filled_data = await DatabaseManager.fill_missing_data(
+            guild_id=guild.id,
+            user_id=interaction.user.id,
+            server_config=None,
+            server_tags=None,
+        )
+        server_config: ServerConfiguration = filled_data.server_config
+        server_tags: ServerTags = filled_data.server_tags
 
         if server_tags is None:
             await interaction.followup.send(
@@ -134,7 +147,12 @@ class AdminCommandsCog(commands.Cog):
     ):
         guild = interaction.guild
         await interaction.response.defer(ephemeral=True)
-        server_config = await Database.select_one(ServerConfiguration, ServerConfiguration.server_id.is_(guild.id))
+        filled_data = await DatabaseManager.fill_missing_data(
+            guild_id=guild.id,
+            user_id=interaction.user.id,
+            server_config=None,
+        )
+        server_config: ServerConfiguration = filled_data.server_config
 
         if role is None:
             if server_config.mention_role is None:
@@ -1,5 +1,10 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Iterable, Sequence
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from database import (
     Database, 
@@ -10,13 +15,45 @@ from database import (
     ServerTags, 
     UserConfiguration, 
     ServerConfiguration, 
+    Statements,
+    utcnow,
 )
 
-from managers import GroupManager
+from managers import GroupManager, DatabaseManager
 
 from utility import LOG, config
 
 
+class GuildCheckpoint:
+    """伺服器上一次成功同步時的狀態，用於 `on_ready` 重新觸發時只處理有變化的部分"""
+    __slots__ = ('synced_at', 'member_count', 'member_ids', 'group_keys', 'group_hash')
+
+    def __init__(self, guild: discord.Guild, groups: Sequence[Group]):
+        self.synced_at = time.time()
+        """同步完成的時間 (UNIX Timestamp)"""
+        self.member_count = guild.member_count
+        """同步時的成員數量"""
+        self.member_ids = frozenset(member.id for member in guild.members)
+        """同步時的成員 ID"""
+        self.group_keys = frozenset(GuildCheckpoint.group_key(group) for group in groups)
+        """同步時的群組"""
+        self.group_hash = hash(self.group_keys)
+        """群組集合的雜湊值"""
+
+    @staticmethod
+    def group_key(group: Group) -> tuple[int, int, int]:
+        return (group.owner_id, group.voice_channel_id, group.thread_id)
+
+    def unchanged(self, guild: discord.Guild, group_keys: frozenset) -> bool:
+        """成員與群組是否與上次同步時相同"""
+        return (
+            guild.member_count == self.member_count
+            and hash(group_keys) == self.group_hash
+            and group_keys == self.group_keys
+            and all(member.id in self.member_ids for member in guild.members)
+        )
+
+
 class EventDatabase:
     def __init__(self):
         pass
@@ -27,66 +64,104 @@ class EventDatabase:
         增加使用者至資料表
         member: discord.Member
         """
-        user = await Database.select_one(User, User.discord_id.is_(member.id))
-        if user is None:
-            user = User(member.id)
-            user.name = member.name
-
-            LOG.System(f"新增資料: {LOG.User(member)}")
-            await Database.insert_or_replace(user)
-
-            user_config = UserConfiguration(member.id)
-            user_config.user = user
-            user_config.group_password = None
-            user_config.limit_mode = 0
-            
-            await Database.insert_or_replace(user_config)
-            LOG.System(f"新增使用者設定資料: {LOG.User(member)}")
-
-            user_record = UserRecord(member.id)
-            user_record.user = user
-            
-            await Database.insert_or_replace(user_record)
-            return user
+        async with Database.transaction() as transaction:
+            user = await transaction.select_one(User, User.discord_id.is_(member.id))
+            if user is None:
+                user = User(member.id)
+                user.name = member.name
+                user.last_active_at = utcnow()
+
+                LOG.System(f"新增資料: {LOG.User(member)}")
+                await transaction.insert_or_replace(user)
+
+                user_config = UserConfiguration(member.id)
+                user_config.user = user
+                user_config.group_password = None
+                user_config.limit_mode = 0
+                
+                await transaction.insert_or_replace(user_config)
+                LOG.System(f"新增使用者設定資料: {LOG.User(member)}")
+
+                user_record = UserRecord(member.id)
+                user_record.user = user
+                
+                await transaction.insert_or_replace(user_record)
+                return user
         
+    @staticmethod
+    async def add_users(members: Iterable[discord.Member]) -> int:
+        """
+        批次增加使用者至資料表，先一次讀取所有已註冊的使用者 ID，只新增尚未註冊的成員，
+        每 `config.member_register_chunk_size` 位成員一個交易，交易之間讓出事件迴圈，回傳新增的使用者數量
+        members: 可包含重複的成員 (例：多個伺服器的成員)
+        """
+        started = time.perf_counter()
+        known = set(await Database.scalars(Statements.USER_IDS))
+        missing: dict[int, discord.Member] = {}
+        for member in members:
+            if member.id not in known:
+                missing.setdefault(member.id, member)
+        if not missing:
+            return 0
+
+        members = list(missing.values())
+        chunk_size = config.member_register_chunk_size
+        for start in range(0, len(members), chunk_size):
+            chunk = members[start : start + chunk_size]
+            now = utcnow()
+            async with Database.transaction() as transaction:
+                await transaction.upsert(
+                    User, [{"discord_id": member.id, "name": member.name, "last_active_at": now} for member in chunk]
+                )
+                # 只有 Primary Key 的資料若已存在則略過，其餘欄位使用預設值
+                await transaction.upsert(UserConfiguration, [{"discord_id": member.id} for member in chunk])
+                await transaction.upsert(UserRecord, [{"discord_id": member.id} for member in chunk])
+            LOG.System(f"新增使用者資料: {min(start + chunk_size, len(members))}/{len(members)}")
+            await asyncio.sleep(0)
+
+        LOG.System(f"已新增 {len(members)} 位使用者，耗時 {time.perf_counter() - started:.2f} 秒")
+        return len(members)
+
     @staticmethod
     async def add_server(guild: discord.Guild) -> Server | None:
         """
         增加伺服器至資料表
         guild: discord.Guild
         """
-        server = await Database.select_one(Server, Server.server_id.is_(guild.id))
-        if server is None:
-            server = Server(guild.id)
-            server.name = guild.name
+        async with Database.transaction() as transaction:
+            server = await transaction.select_one(Server, Server.server_id.is_(guild.id))
+            if server is None:
+                server = Server(guild.id)
+                server.name = guild.name
 
 
-            await Database.insert_or_replace(server)
-            LOG.System(f"新增資料: {LOG.Server(guild)}")
+                await transaction.insert_or_replace(server)
+                LOG.System(f"新增資料: {LOG.Server(guild)}")
 
 
-            server_config = ServerConfiguration(guild.id)
-            server_config.server = server
+                server_config = ServerConfiguration(guild.id)
+                server_config.server = server
 
-            await Database.insert_or_replace(server_config)
-            LOG.System(f"新增設定資料: {LOG.Server(guild)}")
-            
+                await transaction.insert_or_replace(server_config)
+                LOG.System(f"新增設定資料: {LOG.Server(guild)}")
+                
 
 
-            server_tags = ServerTags(guild.id)
-            server_tags.server = server
-            server_tags.versions= {}
-            server_tags.custom_tags = {}
-            await Database.insert_or_replace(server_tags)
-            LOG.System(f"新增標籤資料: {LOG.Server(guild)}")
-            return server
+                server_tags = ServerTags(guild.id)
+                server_tags.server = server
+                server_tags.versions= {}
+                server_tags.custom_tags = {}
+                await transaction.insert_or_replace(server_tags)
+                LOG.System(f"新增標籤資料: {LOG.Server(guild)}")
+                return server
         
 
         
     @staticmethod
     async def group_check(bot: commands.Bot, guild: discord.Guild, group: Group) -> Group | None:
         """
-        檢查群組的有效性，若無效則刪除相關資料，若有效則執行某個函式
+        檢查群組的有效性，若無效則刪除相關資料，若有效則重新註冊互動介面，
+        語音頻道沒人的群組不直接刪除，而是從資料庫記錄的刪除期限繼續倒數，只使用快取的資料，不呼叫 API
         guild: discord.Guild
         group: Group
         """
@@ -99,16 +174,15 @@ class EventDatabase:
             if user is None:
                 raise ValueError("群組擁有者不存在")
 
-            # 檢查語音頻道是否存在且有成員
+            # 檢查語音頻道是否存在
             voice_channel = guild.get_channel(group.voice_channel_id)
-            if voice_channel is None or len(voice_channel.members) == 0:
-                raise ValueError("語音頻道不存在或無成員")
+            if voice_channel is None:
+                raise ValueError("語音頻道不存在")
 
-            # 檢查討論串是否存在且描述訊息有效
+            # 檢查討論串是否存在
             thread = guild.get_thread(group.thread_id)
             if thread is None:
                 raise ValueError("討論串不存在")
-            await thread.fetch_message(group.description_message_id)
 
             # 如果檢查通過，執行某個函式
             await GroupManager.add_views(
@@ -117,6 +191,12 @@ class EventDatabase:
                 user=user,
                 voice_channel=voice_channel,
             )
+            # 頻道沒人則繼續倒數，有人則清除刪除期限
+            await GroupManager.auto_delete_voice_channel(
+                guild=guild,
+                voice_channel=voice_channel,
+                group=group,
+            )
             LOG.System(f"群組檢查通過並執行函式: {LOG.User(group.owner_id)}")
 
         except Exception as e:
@@ -134,9 +214,56 @@ class EventDatabase:
             except Exception as delete_error:
                 LOG.System(f"刪除群組資料時發生錯誤: {delete_error}")
 
+    @staticmethod
+    def is_occupied(guild: discord.Guild, group: Group) -> bool:
+        """群組的語音頻道是否有成員"""
+        voice_channel = guild.get_channel(group.voice_channel_id)
+        return voice_channel is not None and len(voice_channel.members) > 0
+
+    @staticmethod
+    async def reconcile_groups(bot: commands.Bot, groups: dict[discord.Guild, Sequence[Group]]) -> None:
+        """
+        並行檢查多個伺服器的群組，同時進行的檢查數量受全域與每個伺服器的上限限制，
+        語音頻道有成員的群組優先檢查，每個伺服器檢查完成時紀錄耗時
+        groups: {伺服器: 該伺服器的群組}
+        """
+        started = time.perf_counter()
+        global_semaphore = asyncio.Semaphore(config.group_check_concurrency)
+        guild_semaphores = {guild.id: asyncio.Semaphore(config.group_check_guild_concurrency) for guild in groups}
+
+        async def check(guild: discord.Guild, group: Group) -> None:
+            async with guild_semaphores[guild.id], global_semaphore:
+                await EventDatabase.group_check(bot=bot, guild=guild, group=group)
+
+        # Semaphore 依先來後到放行，依序建立 task 即可讓有成員的群組先檢查
+        ordered = sorted(
+            ((guild, group) for guild, guild_groups in groups.items() for group in guild_groups),
+            key=lambda item: not EventDatabase.is_occupied(*item),
+        )
+        tasks: dict[discord.Guild, list[asyncio.Task]] = defaultdict(list)
+        for guild, group in ordered:
+            tasks[guild].append(asyncio.create_task(check(guild, group)))
+
+        async def wait_guild(guild: discord.Guild, guild_tasks: list[asyncio.Task]) -> None:
+            await asyncio.gather(*guild_tasks)
+            LOG.System(
+                f"伺服器 {LOG.Server(guild)} 的 {len(guild_tasks)} 個群組檢查完成，耗時 {time.perf_counter() - started:.2f} 秒"
+            )
+
+        await asyncio.gather(*(wait_guild(guild, guild_tasks) for guild, guild_tasks in tasks.items()))
+        if tasks:
+            LOG.System(f"共 {len(ordered)} 個群組檢查完成，耗時 {time.perf_counter() - started:.2f} 秒")
+
 class EventManageCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot: commands.Bot = bot
+        self.checkpoints: dict[int, GuildCheckpoint] = {}
+        """各伺服器上一次成功同步的狀態，重新連線觸發 on_ready 時只處理有變化的伺服器"""
+        self.prune_expired_users.start()
+
+
+    async def cog_unload(self) -> None:
+        self.prune_expired_users.cancel()
 
 
     @commands.Cog.listener()
@@ -149,26 +276,56 @@ class EventManageCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_ready(self):
-
-
+        # 每次重新建立連線都會觸發，已同步過的伺服器只處理與上次同步之間的差異
+        groups_by_server = defaultdict(list)
+        for group in await Database.select_all(Group):
+            groups_by_server[group.server_id].append(group)
+
+        groups = {}
+        new_members: list[discord.Member] = []
+        checkpoints: dict[int, GuildCheckpoint] = {}
+        skipped = 0
         for guild in self.bot.guilds:
-            server = await Database.select_one(Server, Server.server_id.is_(guild.id))
+            guild_groups = groups_by_server.get(guild.id, [])
+            checkpoint = self.checkpoints.get(guild.id)
+            checkpoints[guild.id] = GuildCheckpoint(guild, guild_groups)
+
+            if checkpoint is None:
+                server = await Database.select_one(Server, Server.server_id.is_(guild.id))
+
+                if server is None:
+                    await EventDatabase.add_server(guild)
+
+                else:
+                    groups[guild] = guild_groups
+                new_members.extend(guild.members)
+                continue
+
+            # 斷線期間可能錯過語音事件，沒有成員的群組即使沒有變化也需要檢查，不需呼叫 API
+            changed_groups = [
+                group for group in guild_groups
+                if GuildCheckpoint.group_key(group) not in checkpoint.group_keys
+                or not EventDatabase.is_occupied(guild, group)
+            ]
+            if changed_groups:
+                groups[guild] = changed_groups
+            if checkpoint.unchanged(guild, checkpoints[guild.id].group_keys):
+                skipped += 1
+                continue
+            new_members.extend(member for member in guild.members if member.id not in checkpoint.member_ids)
+
+        if skipped > 0:
+            LOG.System(f"{skipped} 個伺服器自上次同步後沒有變化，略過同步")
+
+        await EventDatabase.reconcile_groups(bot=self.bot, groups=groups)
 
-            if server is None:
-                await EventDatabase.add_server(guild)
-
-            else:
-                groups = await Database.select_all(Group, Group.server_id.is_(guild.id))
-                for group in groups:
-                    await EventDatabase.group_check(bot=self.bot, guild=guild, group=group)
-
-                    
-            for member in guild.members:
-                try:
-                    await EventDatabase.add_user(member)
-                    
-                except Exception as e:
-                    LOG.System(f"錯誤{e}")
+        try:
+            if new_members:
+                await EventDatabase.add_users(new_members)
+        except Exception as e:
+            LOG.System(f"錯誤{e}")
+        else:
+            self.checkpoints.update(checkpoints)
 
 
 
@@ -176,19 +333,19 @@ class EventManageCog(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild | None):
         await EventDatabase.add_server(guild)
-        for member in guild.members:
-            try:
-                await EventDatabase.add_user(member)
-            except Exception as e:
-                LOG.System(f"錯誤{e}")
+        try:
+            await EventDatabase.add_users(guild.members)
+        except Exception as e:
+            LOG.System(f"錯誤{e}")
 
 
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild: discord.Guild | None):
+        self.checkpoints.pop(guild.id, None)
         server = await Database.select_one(Server, Server.server_id.is_(guild.id))
         if server is not None:
-            await Database.delete(server)
+            await Database.delete_all(server_id=guild.id)
             LOG.System(f"伺服器: {LOG.Server(guild)} 被移除")
         else:
             LOG.System(f"伺服器: {LOG.Server(guild)} 已經不存在")
@@ -209,5 +366,27 @@ class EventManageCog(commands.Cog):
 
 
 
+    # ======== Loop Task ========
+
+    # 定時刪除超過 config.expired_user_days 天未活動的使用者
+    @tasks.loop(hours=config.expired_user_prune_hours)
+    async def prune_expired_users(self):
+        try:
+            pruned = await DatabaseManager.prune_expired_users(
+                days=config.expired_user_days,
+                chunk_size=config.expired_user_prune_chunk_size,
+            )
+            if pruned > 0:
+                LOG.System(f"已刪除 {pruned} 位超過 {config.expired_user_days} 天未活動的使用者")
+        except Exception as e:
+            LOG.Error(f"刪除過期使用者失敗: {e}")
+
+    @prune_expired_users.before_loop
+    async def before_prune_expired_users(self):
+        await self.bot.wait_until_ready()
+
+
+
+
 async def setup(client: commands.Bot):
     await client.add_cog(EventManageCog(client))
@@ -66,18 +66,20 @@ class ListManagerCog(commands.Cog):
             _add_list = page_list.member_list(name="增加", color=add_color)
             _remove_list = page_list.member_list(name="移除", color=remove_color)
 
-            for member in members:
-                entry = await Database.select_one(
-                    model, 
-                    sqlalchemy.and_(model.discord_id == member.id, model.user_id == user.id)
-                )
-                
-                if entry is None:
-                    await Database.insert_or_replace(model(discord_id=member.id, user_id=user.id))
-                    _add_list.add_member(member)
-                else:
-                    await Database.delete_instance(entry)
-                    _remove_list.add_member(member)
+            async with Database.transaction() as transaction:
+                for member in members:
+                    # 以 Primary Key (user_id, discord_id) 刪除，若沒有刪除任何資料表示不在名單內，改為新增
+                    removed = await transaction.delete(
+                        model, 
+                        sqlalchemy.and_(model.user_id == user.id, model.discord_id == member.id),
+                        keys=[{"user_id": user.id}],
+                    )
+                    
+                    if removed == 0:
+                        await transaction.insert_or_replace(model(user_id=user.id, discord_id=member.id))
+                        _add_list.add_member(member)
+                    else:
+                        _remove_list.add_member(member)
             await page_list.send_form_pages(interaction, f"{list_type}操作", [_add_list, _remove_list])
         else:
             entries = await Database.select_all(model, model.user_id == user.id)
@@ -7,13 +7,14 @@ from discord import app_commands
 
 from database import Database, WhiteList, BlackList, ServerConfiguration, Server, UserConfiguration, User, Group, UserRecord, ServerTags
 
-from utility import SlashCommandLogger, LOG, config, steam_API, TimeoutOperation
+from utility import SlashCommandLogger, LOG, config, steam_API, TimeoutOperation, EventCoalescer
 
 from typing import Optional, List
 
 from managers.ui import CreateButtonView
 
 from managers import GroupManager
+from managers import DatabaseManager
 from managers import SettingPasswordModal
 from managers import SettingGroupModal
 from managers.ui import ThreadMenuNav
@@ -26,8 +27,11 @@ from functools import partial
 class LookingForGroupCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot: commands.Bot = bot
-        # 用來追蹤語音頻道的倒數任務
-        
+        # 合併同一個語音頻道短時間內的狀態事件，只依最後的人數處理一次
+        self.voice_events: EventCoalescer[int, discord.VoiceChannel] = EventCoalescer(
+            "voice_state", config.voice_event_coalesce_window, self._evaluate_voice_channel
+        )
+
 
     @commands.has_permissions(administrator=True)
     @app_commands.command(name="設定揪團頻道", description="創建或設定揪團頻道，選項為可選")
@@ -67,17 +71,18 @@ class LookingForGroupCog(commands.Cog):
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         if member.bot:
             return
-        guild = member.guild
-        if before.channel is not None:
-            await GroupManager.auto_delete_voice_channel(
-                guild=guild,
-                voice_channel=before.channel,
-            )
-        if after.channel is not None:
-            await GroupManager.auto_delete_voice_channel(
-                guild=guild,
-                voice_channel=after.channel,
-            )
+        if before.channel == after.channel:
+            # 靜音、視訊等狀態變化，頻道人數不變
+            return
+        for channel in (before.channel, after.channel):
+            if channel is not None:
+                self.voice_events.submit(channel.id, channel)
+
+    async def _evaluate_voice_channel(self, channel_id: int, channel: discord.VoiceChannel):
+        await GroupManager.auto_delete_voice_channel(
+            guild=channel.guild,
+            voice_channel=channel,
+        )
 
     @app_commands.command(name="揪團密碼", description="設定密碼")
     @SlashCommandLogger
@@ -85,10 +90,14 @@ class LookingForGroupCog(commands.Cog):
         self, interaction: discord.Interaction,
     ):
         user = interaction.user
-        user_config = await Database.select_one(UserConfiguration, UserConfiguration.discord_id.is_(user.id))
+        filled_data = await DatabaseManager.fill_missing_data(
+            guild_id=interaction.guild.id,
+            user_id=user.id,
+            user_config=None,
+        )
 
         await interaction.response.send_modal(
-            SettingPasswordModal(user_config=user_config)
+            SettingPasswordModal(user_config=filled_data.user_config)
         )
 
     @app_commands.command(name="揪團設定", description="揪團設定")
@@ -97,13 +106,17 @@ class LookingForGroupCog(commands.Cog):
         self, interaction: discord.Interaction,
     ):
         user = interaction.user
-        user_config = await Database.select_one(UserConfiguration, UserConfiguration.discord_id.is_(user.id))
-        user_record = await Database.select_one(UserRecord, UserRecord.discord_id.is_(user.id))
+        filled_data = await DatabaseManager.fill_missing_data(
+            guild_id=interaction.guild.id,
+            user_id=user.id,
+            user_record=None,
+            user_config=None,
+        )
 
         await interaction.response.send_modal(
             SettingGroupModal(
-                user_record=user_record,
-                user_config=user_config,
+                user_record=filled_data.user_record,
+                user_config=filled_data.user_config,
                 callback=GroupManager.update,
             )
         )
@@ -11,6 +11,8 @@ from database import Database, WhiteList, BlackList, ServerConfiguration, Server
 
 from utility import SlashCommandLogger, LOG, config, steam_API
 
+from managers import DatabaseManager
+
 
 class UserCommandsCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -22,7 +24,12 @@ class UserCommandsCog(commands.Cog):
     async def set_steam_friend_code(
         self, interaction: discord.Interaction, friend_code: int,
     ):
-        server_config = await Database.select_one(ServerConfiguration, ServerConfiguration.server_id.is_(interaction.guild.id))
+        filled_data = await DatabaseManager.fill_missing_data(
+            guild_id=interaction.guild.id,
+            user_id=interaction.user.id,
+            server_config=None,
+        )
+        server_config: ServerConfiguration = filled_data.server_config
         if server_config.steamAPI_key == None:
             await interaction.response.send_message("❌ 錯誤: 伺服器尚未設定 Steam API Key **請聯絡管理員**", ephemeral=True, )
             return
@@ -47,9 +54,14 @@ class UserCommandsCog(commands.Cog):
 
         else:
             """如果找到使用者，則將好友碼存入資料庫"""
-            user_config = await Database.select_one(UserConfiguration, UserConfiguration.discord_id.is_(interaction.user.id))
+            filled_data = await DatabaseManager.fill_missing_data(
+                guild_id=interaction.guild.id,
+                user_id=interaction.user.id,
+                user_config=None,
+            )
+            user_config: UserConfiguration = filled_data.user_config
             user_config.steam_friend_code = friend_code
-            await Database.insert_or_replace(user_config)
+            await DatabaseManager.queue_data(user_config=user_config)
             await interaction.response.send_message(f"✅ 已將好友碼設為: `{friend_code}`", ephemeral=True, )
 
 
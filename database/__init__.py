@@ -1,4 +1,9 @@
-from .app import Database
+from .app import Database, Transaction
+from .cache import MISSING, copy_rows, RowCache, GuildConfigCache, GroupChannelRegistry, MembershipIndex
+from .loader import DataLoader, LoaderGroup
+from .statements import Statements
+from .write_behind import WriteBehindQueue
+from .activity import ActivityTracker, utcnow
 from .models import (
     Base,
     WhiteList,
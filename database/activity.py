@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncContextManager, Callable, Optional
+
+import sqlalchemy
+from sqlalchemy import bindparam
+
+from utility import LOG
+
+from .models import User
+
+
+def utcnow() -> datetime:
+    """目前的 UTC 時間，不含時區資訊，與資料庫內儲存的時間格式一致"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ActivityTracker:
+    """記錄使用者的最後活躍時間，互動時只更新記憶體內的 dict，
+    每隔 `interval` 秒在同一個交易內以單一 executemany 寫回 `User.last_active_at`
+
+    Parameters
+    ------
+    interval: `float`
+        寫回資料庫的間隔（單位：秒）
+    transaction: `Callable[[], AsyncContextManager]`
+        開啟交易的函式，通常為 `Database.transaction`
+    """
+
+    _statement = (
+        sqlalchemy.update(User.__table__)
+        .where(User.__table__.c.discord_id == bindparam("user_id"))
+        .values(last_active_at=bindparam("active_at"))
+    )
+
+    def __init__(self, interval: float, transaction: Callable[[], AsyncContextManager]) -> None:
+        self.interval = interval
+        self.transaction = transaction
+        self._pending: dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._closing = asyncio.Event()
+        """設定後定時寫入的協程在目前的寫入完成後結束，不會在寫入途中被取消"""
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, user_id: int) -> None:
+        """記錄使用者此刻有活動，同一個使用者在下次寫回前只保留最後一次"""
+        self._pending[user_id] = utcnow()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self) -> None:
+        """將記錄的活躍時間寫回資料庫，尚未註冊的使用者不會被更新，失敗或被取消時放回等待下次寫入"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        written = False
+        try:
+            async with self.transaction() as transaction:
+                await transaction.session.execute(
+                    self._statement,
+                    [{"user_id": user_id, "active_at": active_at} for user_id, active_at in pending.items()],
+                )
+            written = True
+        except Exception as e:
+            LOG.Error(f"database: 寫入使用者活躍時間失敗: {e}")
+        finally:
+            if not written:
+                # 等待期間記錄的活躍時間較新，不覆蓋
+                for user_id, active_at in pending.items():
+                    self._pending.setdefault(user_id, active_at)
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.interval)
+            except TimeoutError:
+                await self.flush()
+
+    async def close(self) -> None:
+        """停止定時寫入，等待進行中的寫入完成後，將剩餘的活躍時間寫入資料庫"""
+        self._closing.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
@@ -0,0 +1,32 @@
+"""查詢索引
+
+Revision ID: 7c41e2a9f0d3
+Revises: d59e8617181b
+Create Date: 2026-10-18 10:12:31.204517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41e2a9f0d3'
+down_revision: Union[str, None] = 'd59e8617181b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 以擁有者查詢名單，索引同時包含 discord_id，查詢時不需回表
+    op.create_index('ix_white_list_user_id_discord_id', 'white_list', ['user_id', 'discord_id'])
+    op.create_index('ix_black_list_user_id_discord_id', 'black_list', ['user_id', 'discord_id'])
+    # 語音狀態事件以伺服器與語音頻道查詢群組；以 owner_id 查詢則已由 Primary Key (owner_id, server_id, voice_channel_id) 涵蓋
+    op.create_index('ix_group_server_id_voice_channel_id', 'group', ['server_id', 'voice_channel_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_group_server_id_voice_channel_id', table_name='group')
+    op.drop_index('ix_black_list_user_id_discord_id', table_name='black_list')
+    op.drop_index('ix_white_list_user_id_discord_id', table_name='white_list')
@@ -0,0 +1,27 @@
+"""房間刪除期限
+
+Revision ID: a4d8e6b3c917
+Revises: f3a9c1d72b85
+Create Date: 2026-10-18 16:22:10.385274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8e6b3c917'
+down_revision: Union[str, None] = 'f3a9c1d72b85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('group', sa.Column('delete_deadline', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('group') as batch_op:
+        batch_op.drop_column('delete_deadline')
@@ -0,0 +1,28 @@
+"""名單成員索引
+
+Revision ID: b5e1d9c4a2f7
+Revises: a4d8e6b3c917
+Create Date: 2026-10-18 17:05:41.218903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1d9c4a2f7'
+down_revision: Union[str, None] = 'a4d8e6b3c917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_white_list_discord_id', 'white_list', ['discord_id'])
+    op.create_index('ix_black_list_discord_id', 'black_list', ['discord_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_black_list_discord_id', table_name='black_list')
+    op.drop_index('ix_white_list_discord_id', table_name='white_list')
@@ -0,0 +1,77 @@
+"""名單複合主鍵
+
+Revision ID: e2b87d51c6a4
+Revises: 7c41e2a9f0d3
+Create Date: 2026-10-18 11:40:07.918236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b87d51c6a4'
+down_revision: Union[str, None] = '7c41e2a9f0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+"""每批搬移的資料筆數"""
+
+
+def _copy_in_batches(source: str, target: str, insert: str = "INSERT") -> None:
+    """依 rowid 分批將 source 的資料搬移到 target，每個 `INSERT ... SELECT` 最多處理 `BATCH_SIZE` 筆，
+    所有批次與整個遷移仍在 env.py 的同一個交易內提交，遷移期間持續佔用寫入鎖，中途失敗時全部回滾，
+    不會留下搬移到一半的資料表
+    """
+    conn = op.get_bind()
+    start = conn.execute(sa.text(f"SELECT MIN(rowid) - 1 FROM {source}")).scalar()
+    while start is not None:
+        end = conn.execute(
+            sa.text(
+                f"SELECT MAX(rowid) FROM "
+                f"(SELECT rowid FROM {source} WHERE rowid > :start ORDER BY rowid LIMIT :limit)"
+            ),
+            {"start": start, "limit": BATCH_SIZE},
+        ).scalar()
+        if end is None:
+            break
+        conn.execute(
+            sa.text(
+                f"{insert} INTO {target} (user_id, discord_id) "
+                f"SELECT user_id, discord_id FROM {source} "
+                f"WHERE rowid > :start AND rowid <= :end ORDER BY rowid"
+            ),
+            {"start": start, "end": end},
+        )
+        start = end
+
+
+def _rebuild(table: str, primary_key: list[str], insert: str) -> None:
+    op.create_table(
+        f'{table}_new',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.discord_id'), nullable=False),
+        sa.Column('discord_id', sa.Integer(), sa.ForeignKey('users.discord_id'), nullable=False),
+        sa.PrimaryKeyConstraint(*primary_key),
+    )
+    _copy_in_batches(table, f'{table}_new', insert)
+    op.drop_table(table)
+    op.rename_table(f'{table}_new', table)
+
+
+def upgrade() -> None:
+    # Primary Key 改為 (user_id, discord_id)，同一成員可以在不同擁有者的名單內，
+    # 以擁有者查詢名單與檢查成員是否在名單內都由 Primary Key 索引涵蓋，不再需要額外索引
+    for table in ('white_list', 'black_list'):
+        op.drop_index(f'ix_{table}_user_id_discord_id', table_name=table)
+        _rebuild(table, ['user_id', 'discord_id'], "INSERT")
+
+
+def downgrade() -> None:
+    # 舊結構以 discord_id 為 Primary Key，同一成員只保留最早加入的一筆
+    for table in ('white_list', 'black_list'):
+        _rebuild(table, ['discord_id'], "INSERT OR IGNORE")
+        op.create_index(f'ix_{table}_user_id_discord_id', table, ['user_id', 'discord_id'])
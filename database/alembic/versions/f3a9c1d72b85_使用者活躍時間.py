@@ -0,0 +1,33 @@
+"""使用者活躍時間
+
+Revision ID: f3a9c1d72b85
+Revises: e2b87d51c6a4
+Create Date: 2026-10-18 14:05:52.641093
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c1d72b85'
+down_revision: Union[str, None] = 'e2b87d51c6a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('last_active_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_users_last_active_at', 'users', ['last_active_at'])
+    # 既有使用者沒有活躍紀錄，以遷移時間作為起點，避免第一次清理就刪除所有使用者
+    users = sa.table('users', sa.column('last_active_at', sa.DateTime()))
+    op.execute(users.update().values(last_active_at=datetime.now(timezone.utc).replace(tzinfo=None)))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_last_active_at', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('last_active_at')
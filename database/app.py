@@ -1,13 +1,25 @@
+import asyncio
+import contextlib
+import itertools
 import pathlib
-from typing import Sequence, TypeVar, Optional
+import re
+import time
+from typing import Any, AsyncIterator, Iterable, Sequence, TypeVar, Optional
 
 import sqlalchemy
-from alembic import command as alembic_cmd
-from alembic.config import Config as alembic_config
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy import Select, Update, event
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.sql._typing import ColumnExpressionArgument
 from typing import List
 
+from utility import LOG, config
+
+from .cache import MISSING, GroupChannelRegistry, GuildConfigCache, MembershipIndex, RowCache
+from .statements import Statements
+from .write_behind import WriteBehindQueue
+from .activity import ActivityTracker
 from .models import (
     Base,
     WhiteList,
@@ -25,39 +37,493 @@ DatabaseModel = Base
 T_DatabaseModel = TypeVar("T_DatabaseModel", bound=Base)
 
 
-_engine = create_async_engine("sqlite+aiosqlite:///data/repodb/bot.db")
+SQLITE_PRAGMAS = {
+    "journal_mode": config.sqlite_journal_mode,
+    "synchronous": config.sqlite_synchronous,
+    "mmap_size": config.sqlite_mmap_size,
+    "cache_size": config.sqlite_cache_size,
+    "temp_store": config.sqlite_temp_store,
+    "busy_timeout": config.sqlite_busy_timeout,
+}
+"""每個 SQLite 連線建立時套用的 PRAGMA 設定"""
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """新連線建立時套用 `SQLITE_PRAGMAS`"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _apply_sqlite_read_pragmas(dbapi_connection, connection_record) -> None:
+    """唯讀連線建立時套用 `SQLITE_PRAGMAS`，journal_mode 記錄在資料庫檔案內，由寫入連線設定"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if name != "journal_mode":
+            cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _is_memory(url: URL) -> bool:
+    """是否為 SQLite 記憶體資料庫，包含 `:memory:` 與 `file:...?mode=memory` 的共享快取形式"""
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def _create_engines(url: URL) -> tuple[AsyncEngine, AsyncEngine]:
+    """依據資料庫 URL 建立 (寫入, 讀取) Engine
+    - SQLite 檔案：寫入固定一條連線，讀取另開唯讀連線池，WAL 模式下讀取不會被寫入交易阻擋
+    - SQLite 記憶體：讀寫共用同一條連線，否則每條連線各自是一個空的資料庫，讀取與寫入交易共用同一個排隊鎖
+    - 其他資料庫：讀寫共用一個連線池，MySQL 以 `ON DUPLICATE KEY UPDATE` 進行 upsert，
+      其他不支援 upsert 語法的資料庫逐筆 `UPDATE` 或 `INSERT`
+    """
+    options = {
+        "pool_pre_ping": config.db_pool_pre_ping,
+        "query_cache_size": config.db_query_cache_size,
+    }
+    if url.get_backend_name() != "sqlite":
+        engine = create_async_engine(
+            url, pool_size=config.db_pool_size, pool_timeout=config.db_pool_timeout, **options
+        )
+        return engine, engine
+
+    if _is_memory(url):
+        engine = create_async_engine(url, poolclass=sqlalchemy.StaticPool, **options)
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return engine, engine
+
+    write_engine = create_async_engine(url, pool_size=1, max_overflow=0, **options)
+    event.listen(write_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    read_url = url.update_query_dict({"mode": "ro", "uri": "true"})
+    if not url.database.startswith("file:"):
+        read_url = read_url.set(database=f"file:{url.database}")
+    read_engine = create_async_engine(
+        read_url,
+        pool_size=config.db_read_pool_size,
+        max_overflow=0,
+        pool_timeout=config.db_pool_timeout,
+        **options,
+    )
+    event.listen(read_engine.sync_engine, "connect", _apply_sqlite_read_pragmas)
+    return write_engine, read_engine
+
+
+_url = make_url(config.database_url)
+_engine, _read_engine = _create_engines(_url)
 _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+_read_sessionmaker = async_sessionmaker(_read_engine, expire_on_commit=False)
+_write_lock = asyncio.Lock() if _url.get_backend_name() == "sqlite" else contextlib.nullcontext()
+"""SQLite 寫入交易的排隊鎖，等待者依先來後到取得唯一的寫入連線，其他資料庫不需排隊"""
+_read_lock = _write_lock if _is_memory(_url) else contextlib.nullcontext()
+"""SQLite 記憶體資料庫讀寫共用同一條連線，讀取 session 關閉時會重置連線、回滾進行中的寫入交易，因此讀取也要排隊"""
+_row_cache = RowCache("rows", maxsize=config.db_cache_max_size, ttl=config.db_cache_ttl)
+_guild_configs = GuildConfigCache()
+_group_channels = GroupChannelRegistry("group_channels")
+_memberships = MembershipIndex("memberships")
+_MEMBER_IDS = {
+    WhiteList: Statements.WHITE_LIST_MEMBER_IDS,
+    BlackList: Statements.BLACK_LIST_MEMBER_IDS,
+}
+"""`MembershipIndex.tables` 對應的成員 ID 查詢敘述"""
+
+_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+"""支援 `INSERT ... ON CONFLICT` 的資料庫與對應的 insert 建構函式"""
+_MYSQL_DIALECTS = ("mysql", "mariadb")
+"""以 `INSERT ... ON DUPLICATE KEY UPDATE` 進行 upsert 的資料庫"""
+
+
+@contextlib.asynccontextmanager
+async def _read_session() -> AsyncIterator[AsyncSession]:
+    """開啟讀取用的 session，記憶體資料庫會先取得 `_read_lock`"""
+    async with _read_lock:
+        async with _read_sessionmaker() as session:
+            yield session
+
+ALEMBIC_INI = "database/alembic/alembic.ini"
+ALEMBIC_VERSIONS = pathlib.Path("database/alembic/versions")
+"""Alembic 版本檔案所在的資料夾"""
+
+_REVISION_LINE = re.compile(r"^(revision|down_revision)\b[^=]*=(.*)$", re.MULTILINE)
+_REVISION_ID = re.compile(r"['\"]([0-9A-Za-z_]+)['\"]")
+
+
+def _script_revisions() -> dict[str, tuple[str, ...]]:
+    """直接讀取版本檔案的 `revision` 與 `down_revision`，回傳 {版本: 前一版本們}，不需載入 Alembic"""
+    revisions = {}
+    for path in ALEMBIC_VERSIONS.glob("*.py"):
+        fields = {name: _REVISION_ID.findall(value) for name, value in _REVISION_LINE.findall(path.read_text("utf-8"))}
+        if fields.get("revision"):
+            revisions[fields["revision"][0]] = tuple(fields.get("down_revision", ()))
+    return revisions
+
+
+def _pending_revisions(revisions: dict[str, tuple[str, ...]], current: set[str]) -> list[str]:
+    """從 head 往回走到資料庫目前的版本，回傳尚未執行的版本"""
+    parents = {parent for down in revisions.values() for parent in down}
+    pending, stack = [], [revision for revision in revisions if revision not in parents]
+    while stack:
+        revision = stack.pop()
+        if revision in current or revision in pending or revision not in revisions:
+            continue
+        pending.append(revision)
+        stack.extend(revisions[revision])
+    return pending
+
+
+def _database_revisions(connection: sqlalchemy.Connection) -> set[str] | None:
+    """讀取資料庫的 `alembic_version`，資料庫內沒有任何 Table 時回傳 `None`，尚未由 Alembic 管理則回傳空集合"""
+    tables = sqlalchemy.inspect(connection).get_table_names()
+    if not tables:
+        return None
+    if "alembic_version" not in tables:
+        return set()
+    return {row[0] for row in connection.exec_driver_sql("SELECT version_num FROM alembic_version")}
+
+
+def _run_alembic(command: str) -> None:
+    """執行 Alembic 命令 (`upgrade` 或 `stamp`) 到 head，Alembic 只在需要時才載入"""
+    from alembic import command as alembic_cmd
+    from alembic.config import Config as alembic_config
+
+    alembic_cfg = alembic_config(ALEMBIC_INI)
+    # Alembic 使用同步 driver，以設定的資料庫 URL 取代 alembic.ini 內的預設值
+    sync_url = _url.set(drivername=_url.get_backend_name())
+    alembic_cfg.set_main_option("sqlalchemy.url", sync_url.render_as_string(hide_password=False).replace("%", "%%"))
+    getattr(alembic_cmd, command)(alembic_cfg, "head")
+
+
+UPSERT_CHUNK_SIZE = 10000
+"""`bulk_upsert` 每次 executemany 送出的最大筆數"""
+
+
+def _to_row(table: type[DatabaseModel], row: DatabaseModel | dict[str, Any]) -> dict[str, Any]:
+    """將 ORM 物件轉成 {欄位名稱: 值} 的 dict，dict 則直接回傳"""
+    if isinstance(row, dict):
+        return row
+    mapper = sqlalchemy.inspect(table)
+    return {attr.columns[0].name: getattr(row, attr.key) for attr in mapper.column_attrs}
+
+
+def _upsert_statement(table: type[DatabaseModel], columns: Iterable[str], dialect: str):
+    """建立 `INSERT ... ON CONFLICT (Primary Key) DO UPDATE` 敘述 (MySQL 為 `ON DUPLICATE KEY UPDATE`)，
+    衝突時以新值覆蓋 `columns` 中的非 Primary Key 欄位，不支援的資料庫回傳 `None`
+    """
+    primary_keys = [column.name for column in table.__table__.primary_key]
+    if dialect in _MYSQL_DIALECTS:
+        stmt = mysql.insert(table.__table__)
+        # 沒有要更新的欄位時以 Primary Key 更新為自己，等同忽略衝突
+        update_names = [name for name in columns if name not in primary_keys] or primary_keys[:1]
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in update_names})
+    insert = _INSERTS.get(dialect)
+    if insert is None:
+        return None
+    stmt = insert(table.__table__)
+    update_columns = {name: stmt.excluded[name] for name in columns if name not in primary_keys}
+    if not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=primary_keys)
+    return stmt.on_conflict_do_update(index_elements=primary_keys, set_=update_columns)
+
+
+class Transaction:
+    """資料庫交易，區塊內的插入、選擇、刪除共用同一個 session，離開區塊時才一次提交，
+    透過 `Database.transaction()` 取得
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self._written_rows: list[tuple[type[DatabaseModel], DatabaseModel | dict[str, Any]]] = []
+        """交易內寫入的資料，提交後用來更新快取"""
+        self._deleted_rows: list[tuple[type[DatabaseModel], DatabaseModel]] = []
+        """交易內刪除的資料，提交後用來更新快取"""
+        self._written_tables: set[type[DatabaseModel]] = set()
+        """交易內以條件刪除的 Table，提交後用來更新快取"""
+        self._deleted_keys: list[tuple[type[DatabaseModel], dict[str, Any]]] = []
+        """交易內以條件刪除或更新、已知受影響 Key 的資料，提交後只使對應的快取失效"""
+
+    def _invalidate_cache(self) -> None:
+        """交易提交後，使被修改資料的快取失效，並更新伺服器設定快照"""
+        for table, row in self._written_rows:
+            _row_cache.invalidate(table, row)
+            _guild_configs.store(table, row)
+            _memberships.invalidate(table, row)
+            if table is Group:
+                _group_channels.add(row["voice_channel_id"] if isinstance(row, dict) else row.voice_channel_id)
+        for table, row in self._deleted_rows:
+            _row_cache.invalidate(table, row)
+            _memberships.invalidate(table, row)
+            if table in _guild_configs.tables:
+                _guild_configs.discard(table, row.server_id)
+            if table is Group:
+                _group_channels.discard(row.voice_channel_id)
+        for table, key in self._deleted_keys:
+            _row_cache.invalidate(table, key)
+            _memberships.invalidate(table, key)
+        for table in self._written_tables:
+            _row_cache.invalidate_table(table)
+            _guild_configs.discard(table)
+            _memberships.invalidate_table(table)
+            if table is Group:
+                _group_channels.invalidate()
+
+    async def insert_or_replace(self, instance: DatabaseModel) -> None:
+        """插入物件，若已存在相同 Primary Key，則以新物件取代舊物件"""
+        await self.upsert(type(instance), instance)
+
+    async def upsert(
+        self,
+        table: type[T_DatabaseModel],
+        rows: T_DatabaseModel | dict[str, Any] | Iterable[T_DatabaseModel | dict[str, Any]],
+    ) -> None:
+        """以單一 executemany 插入或更新一筆或多筆資料，每筆資料需包含相同的欄位"""
+        if isinstance(rows, (Base, dict)):
+            rows = [rows]
+        rows = list(rows)
+        values = [_to_row(table, row) for row in rows]
+        if not values:
+            return
+        dialect = self.session.get_bind().dialect.name
+        stmt = _upsert_statement(table, values[0].keys(), dialect)
+        if stmt is not None:
+            await self.session.execute(stmt, values)
+        else:
+            await self._update_or_insert(table, values)
+        if table in _row_cache.key_columns or table in _guild_configs.tables:
+            self._written_rows.extend((table, row) for row in rows)
+
+    async def _update_or_insert(self, table: type[DatabaseModel], values: list[dict[str, Any]]) -> None:
+        """不支援 upsert 語法的資料庫，逐筆以 Primary Key 查詢是否存在，存在則 `UPDATE`，否則 `INSERT`"""
+        columns = table.__table__.c
+        primary_keys = [column.name for column in table.__table__.primary_key]
+        for value in values:
+            where = [columns[name] == value[name] for name in primary_keys]
+            exists = await self.session.scalar(
+                sqlalchemy.select(sqlalchemy.literal(1)).select_from(table.__table__).where(*where)
+            )
+            if not exists:
+                await self.session.execute(sqlalchemy.insert(table.__table__), [value])
+                continue
+            update_values = {name: item for name, item in value.items() if name not in primary_keys}
+            if update_values:
+                await self.session.execute(sqlalchemy.update(table.__table__).where(*where).values(update_values))
+
+    async def select_one(
+        self,
+        table: type[T_DatabaseModel],
+        whereclause: ColumnExpressionArgument[bool] | None = None,
+    ) -> T_DatabaseModel | None:
+        """指定資料庫 Table 與選擇條件，選擇一項物件，若無任何符合則回傳 `None`"""
+        stmt = sqlalchemy.select(table)
+        if whereclause is not None:
+            stmt = stmt.where(whereclause)
+        result = await self.session.execute(stmt)
+        return result.scalar()
+
+    async def select_all(
+        self,
+        table: type[T_DatabaseModel],
+        whereclause: ColumnExpressionArgument[bool] | None = None,
+    ) -> Sequence[T_DatabaseModel]:
+        """指定資料庫 Table 與選擇條件，選擇符合條件的全部物件"""
+        stmt = sqlalchemy.select(table)
+        if whereclause is not None:
+            stmt = stmt.where(whereclause)
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
+    async def scalars(self, statement: Select, parameters: dict[str, Any] | None = None) -> Sequence[Any]:
+        """執行預先建構的敘述 (例：`Statements` 內的敘述)，只綁定參數，回傳全部物件"""
+        result = await self.session.execute(statement, parameters)
+        return result.scalars().all()
+
+    async def update(
+        self,
+        table: type[DatabaseModel],
+        statement: Update,
+        parameters: dict[str, Any],
+        keys: Iterable[dict[str, Any]] | None = None,
+    ) -> int:
+        """執行預先建構的 `UPDATE` 敘述 (例：`Statements` 內的敘述)，只寫入敘述內的欄位，回傳被更新的資料筆數，
+        `keys` 為受影響資料的快取 Key 欄位 (例：`{"owner_id": 1}`)，有傳入時提交後只使對應的快取失效，
+        否則使整個 Table 的快取失效
+        """
+        result = await self.session.execute(statement, parameters)
+        if keys is None:
+            self._written_tables.add(table)
+        else:
+            self._deleted_keys.extend((table, key) for key in keys)
+        return result.rowcount
+
+    async def delete_instance(self, instance: DatabaseModel) -> None:
+        """刪除該物件"""
+        await self.session.delete(instance)
+        self._deleted_rows.append((type(instance), instance))
+
+    async def delete(
+        self,
+        table: type[T_DatabaseModel],
+        whereclause: ColumnExpressionArgument[bool],
+        keys: Iterable[dict[str, Any]] | None = None,
+    ) -> int:
+        """以單一 `DELETE ... WHERE` 敘述刪除符合條件的物件，回傳被刪除的資料筆數，
+        `keys` 為受影響資料的快取 Key 欄位 (例：`{"user_id": 1}`)，有傳入時提交後只使對應的快取失效，
+        否則使整個 Table 的快取失效，房間與伺服器設定一律使整個 Table 失效
+        """
+        stmt = sqlalchemy.delete(table).where(whereclause).execution_options(synchronize_session=False)
+        result = await self.session.execute(stmt)
+        if keys is None or table is Group or table in _guild_configs.tables:
+            self._written_tables.add(table)
+        else:
+            self._deleted_keys.extend((table, key) for key in keys)
+        return result.rowcount
 
 
 class Database:
     """資料庫方法類別，提供類別方法來操作資料庫，包含了：初始化、關閉、插入、選擇、刪除"""
 
     engine = _engine
+    """寫入用的 Engine，只有一條連線"""
     sessionmaker = _sessionmaker
+    read_engine = _read_engine
+    """讀取用的 Engine，連線以唯讀模式開啟"""
+    read_sessionmaker = _read_sessionmaker
+    cache = _row_cache
+    """使用者相關資料 (`RowCache.key_columns`) 的讀取快取，寫入時自動失效"""
+    guild_configs = _guild_configs
+    """伺服器設定與標籤的快照，由 `load_guild_configs` 載入，寫入時自動更新"""
+    group_channels = _group_channels
+    """所有房間的語音頻道 ID，由 `load_group_channels` 載入，寫入時自動更新"""
+    memberships = _memberships
+    """每位擁有者白名單、黑名單的成員 ID，由 `list_members` 載入，寫入時自動失效"""
+    write_behind = WriteBehindQueue(
+        config.write_behind_interval,
+        config.write_behind_max_pending,
+        transaction=lambda: Database.transaction(),
+    )
+    """使用者狀態的延遲寫入佇列，`config.write_behind_enabled` 為 False 時不使用"""
+    activity = ActivityTracker(config.activity_flush_interval, transaction=lambda: Database.transaction())
+    """使用者最後活躍時間的紀錄，定時批次寫回資料庫"""
 
     @classmethod
     async def init(cls) -> None:
-        
+        """初始化資料庫，在 bot 最初運行時需要呼叫一次，
+        資料庫版本已是最新時不載入 Alembic，需要遷移時在背景執行緒執行，不阻塞事件迴圈
+        """
+        started = time.perf_counter()
+        async with cls.engine.connect() as conn:
+            current = await conn.run_sync(_database_revisions)
 
-        """初始化資料庫，在 bot 最初運行時需要呼叫一次"""
-        alembic_cfg = alembic_config("database/alembic/alembic.ini")
-        if pathlib.Path("data/repodb/bot.db").exists():
+        if _is_memory(cls.engine.url):
 
-            # 如果資料庫檔案存在，運行 Alembic 的 upgrade 命令
-            alembic_cmd.upgrade(alembic_cfg, "head")
+            # 記憶體資料庫每次啟動都是空的，直接創建所有表，不需要 Alembic
+            async with cls.engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        elif current is not None:
+            pending = _pending_revisions(_script_revisions(), current)
+            if not pending:
+                LOG.System(f"database: 資料庫版本 {', '.join(current)} 已是最新，略過遷移")
+            else:
+                # 如果資料庫版本不是最新，在背景執行緒運行 Alembic 的 upgrade 命令
+                LOG.System(f"database: 資料庫版本 {', '.join(current) or '無'}，需要執行 {len(pending)} 個遷移")
+                await asyncio.to_thread(_run_alembic, "upgrade")
+                LOG.System(f"database: 遷移完成，耗時 {time.perf_counter() - started:.2f} 秒")
         else:
 
-            # 如果資料庫檔案不存在，創建所有表並設置版本為 "head"
+            # 如果資料庫是空的，創建所有表並設置版本為 "head"
             async with cls.engine.begin() as conn:
                 await conn.run_sync(Base.metadata.create_all)
-            alembic_cmd.stamp(alembic_cfg, "head")
+            await asyncio.to_thread(_run_alembic, "stamp")
+
+        # 紀錄實際生效的 SQLite 設定
+        if cls.engine.dialect.name == "sqlite":
+            async with cls.engine.connect() as conn:
+                for name in SQLITE_PRAGMAS:
+                    value = (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+                    LOG.System(f"database: PRAGMA {name} = {value}")
+        LOG.System(f"database: 初始化完成，耗時 {time.perf_counter() - started:.2f} 秒")
+
+
+    @classmethod
+    async def load_guild_configs(cls) -> None:
+        """以單一查詢讀取所有伺服器的設定與標籤，建立伺服器設定快照，在 bot 啟動時呼叫一次"""
+        stmt = (
+            sqlalchemy.select(Server.server_id, ServerConfiguration, ServerTags)
+            .outerjoin(ServerConfiguration, ServerConfiguration.server_id == Server.server_id)
+            .outerjoin(ServerTags, ServerTags.server_id == Server.server_id)
+        )
+        async with _read_session() as session:
+            result = await session.execute(stmt)
+            rows = {}
+            for server_id, server_config, server_tags in result:
+                rows[(ServerConfiguration, server_id)] = server_config
+                rows[(ServerTags, server_id)] = server_tags
+        cls.guild_configs.replace(rows)
+        LOG.System(f"database: 已載入 {len(rows) // 2} 個伺服器的設定")
+
+    @classmethod
+    async def load_group_channels(cls) -> None:
+        """讀取所有房間的語音頻道 ID，在 bot 啟動時呼叫一次"""
+        version = cls.group_channels.version
+        channel_ids = await cls.scalars(sqlalchemy.select(Group.voice_channel_id))
+        cls.group_channels.replace(channel_ids, version)
+        LOG.System(f"database: 已載入 {len(channel_ids)} 個房間語音頻道")
+
+    @classmethod
+    async def is_group_channel(cls, channel_id: int) -> bool:
+        """語音頻道是否屬於某個房間，只查詢記憶體，尚未載入或已失效時才讀取資料庫"""
+        if not cls.group_channels.loaded:
+            await cls.load_group_channels()
+        return channel_id in cls.group_channels
 
+    @classmethod
+    async def list_members(cls, table: type[WhiteList] | type[BlackList], owner_id: int) -> frozenset[int]:
+        """擁有者白名單或黑名單內的成員 ID，索引內已有時不讀取資料庫，
+        Example: `member.id in await Database.list_members(WhiteList, owner.id)`
+        """
+        members = cls.memberships.get(table, owner_id)
+        if members is not MISSING:
+            return members
+        version = cls.memberships.version
+        member_ids = await cls.scalars(_MEMBER_IDS[table], {"owner_id": owner_id})
+        return cls.memberships.set(table, owner_id, member_ids, version)
 
     @classmethod
     async def close(cls) -> None:
-        """關閉資料庫，在 bot 關閉前需要呼叫一次"""
+        """關閉資料庫，在 bot 關閉前需要呼叫一次，會先將延遲寫入佇列內剩餘的資料寫入"""
+        await cls.write_behind.close()
+        await cls.activity.close()
+        await cls.read_engine.dispose()
         await cls.engine.dispose()
 
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def transaction(cls, readonly: bool = False) -> AsyncIterator[Transaction]:
+        """開啟一個交易，區塊內所有操作共用同一個 session，正常離開區塊時只提交一次，發生例外則全部回滾，
+        寫入交易依序排隊使用唯一的寫入連線，`readonly` 為 True 時改用唯讀連線池，不需排隊，但區塊內不能寫入，
+        Example:
+        ```
+        async with Database.transaction() as transaction:
+            await transaction.insert_or_replace(user_record)
+            await transaction.insert_or_replace(user_config)
+        ```
+        """
+        if readonly:
+            async with _read_session() as session:
+                async with session.begin():
+                    yield Transaction(session)
+            return
+
+        async with _write_lock:
+            async with cls.sessionmaker() as session:
+                async with session.begin():
+                    transaction = Transaction(session)
+                    yield transaction
+        transaction._invalidate_cache()
+
     @classmethod
     async def insert_or_replace(cls, instance: DatabaseModel) -> None:
         """插入物件到資料庫，若已存在相同 Primary Key，則以新物件取代舊物件，
@@ -68,9 +534,79 @@ class Database:
         instance: `DatabaseModel`
             資料庫 Table (ORM) 的實例物件
         """
-        async with cls.sessionmaker() as session:
-            await session.merge(instance)
-            await session.commit()
+        await cls.upsert(type(instance), instance)
+
+    @classmethod
+    async def upsert(
+        cls,
+        table: type[T_DatabaseModel],
+        rows: T_DatabaseModel | dict[str, Any] | Iterable[T_DatabaseModel | dict[str, Any]],
+    ) -> None:
+        """使用 SQLite 原生的 `INSERT ... ON CONFLICT DO UPDATE`，以單一 executemany 插入或更新一筆或多筆資料，
+        Example: `Database.upsert(UserRecord, [record_a, record_b])`
+
+        Parameters
+        ------
+        table: `type[T_DatabaseModel]`
+            要寫入的資料庫 Table (ORM) Class，Ex: `UserRecord`
+        rows: `T_DatabaseModel` | `dict` | `Iterable`
+            一筆或多筆 ORM 物件或 {欄位名稱: 值} 的 dict，每筆資料需包含相同的欄位
+        """
+        async with cls.transaction() as transaction:
+            await transaction.upsert(table, rows)
+
+    @classmethod
+    async def bulk_upsert(
+        cls,
+        table: type[T_DatabaseModel],
+        rows: Iterable[T_DatabaseModel | dict[str, Any]],
+        chunk_size: int = UPSERT_CHUNK_SIZE,
+    ) -> None:
+        """與 `upsert` 相同，但以每 `chunk_size` 筆為一批送出，適合大量或由 generator 產生的資料，全部批次在同一個交易內提交
+
+        Parameters
+        ------
+        table: `type[T_DatabaseModel]`
+            要寫入的資料庫 Table (ORM) Class，Ex: `UserConfiguration`
+        rows: `Iterable`
+            ORM 物件或 {欄位名稱: 值} 的 dict，每筆資料需包含相同的欄位
+        chunk_size: `int`
+            每次 executemany 送出的最大筆數
+        """
+        iterator = iter(rows)
+        async with cls.transaction() as transaction:
+            while chunk := list(itertools.islice(iterator, chunk_size)):
+                await transaction.upsert(table, chunk)
+
+    @classmethod
+    async def update(
+        cls,
+        table: type[DatabaseModel],
+        statement: Update,
+        parameters: dict[str, Any],
+        keys: Iterable[dict[str, Any]] | None = None,
+    ) -> int:
+        """執行預先建構的 `UPDATE` 敘述，只寫入敘述內的欄位，不會覆蓋其他欄位，
+        Example: `Database.update(Group, Statements.SET_GROUP_DELETE_DEADLINE, {...}, keys=[{"owner_id": 1}])`
+
+        Parameters
+        ------
+        table: `type[DatabaseModel]`
+            敘述更新的資料庫 Table (ORM) Class，Ex: `Group`
+        statement: `Update`
+            `Statements` 內預先建構的 `UPDATE` 敘述
+        parameters: `dict`
+            綁定的參數
+        keys: `Iterable[dict]` | `None`
+            受影響資料的快取 Key 欄位，未傳入則使整個 Table 的快取失效
+
+        Returns
+        ------
+        `int`:
+            被更新的資料筆數
+        """
+        async with cls.transaction() as transaction:
+            return await transaction.update(table, statement, parameters, keys)
 
     @classmethod
     async def select_one(
@@ -93,7 +629,7 @@ class Database:
         `T_DatabaseModel` | `None`:
             根據參數所選擇出該 Table 符合條件的物件，若無任何符合則回傳 `None`
         """
-        async with cls.sessionmaker() as session:
+        async with _read_session() as session:
             stmt = sqlalchemy.select(table)
             if whereclause is not None:
                 stmt = stmt.where(whereclause)
@@ -120,13 +656,38 @@ class Database:
         `Sequence[T_DatabaseModel]`:
             根據參數所選擇出該 Table 符合條件的全部物件
         """
-        async with cls.sessionmaker() as session:
+        async with _read_session() as session:
             stmt = sqlalchemy.select(table)
             if whereclause is not None:
                 stmt = stmt.where(whereclause)
             result = await session.execute(stmt)
             return result.scalars().all()
 
+    @classmethod
+    async def scalar(cls, statement: Select, parameters: dict[str, Any] | None = None) -> Any:
+        """執行預先建構的敘述，只綁定參數，回傳第一項物件，若無任何符合則回傳 `None`，
+        Example: `Database.scalar(Statements.GROUP_BY_OWNER, {"server_id": 1, "owner_id": 2})`
+        """
+        async with _read_session() as session:
+            result = await session.execute(statement, parameters)
+            return result.scalar()
+
+    @classmethod
+    async def scalars(cls, statement: Select, parameters: dict[str, Any] | None = None) -> Sequence[Any]:
+        """執行預先建構的敘述，只綁定參數，回傳全部物件，
+        Example: `Database.scalars(Statements.WHITE_LISTS_BY_OWNER_IDS, {"keys": [1, 2]})`
+
+        Parameters
+        ------
+        statement: `Select`
+            預先建構的查詢敘述，見 `Statements`
+        parameters: `dict[str, Any]` | `None`
+            敘述中 `bindparam` 對應的參數值
+        """
+        async with _read_session() as session:
+            result = await session.execute(statement, parameters)
+            return result.scalars().all()
+
     @classmethod
     async def delete_instance(cls, instance: DatabaseModel) -> None:
         """從資料庫內刪除該物件，使用方式是先使用 `select_one` 或 `select_all` 方法取得物件實例後，傳入本方法進行刪除
@@ -136,53 +697,55 @@ class Database:
         instance: `DatabaseModel`
             資料庫 Table (ORM) 的實例物件
         """
-        async with cls.sessionmaker() as session:
-            await session.delete(instance)
-            await session.commit()
+        async with cls.transaction() as transaction:
+            await transaction.delete_instance(instance)
 
     @classmethod
     async def delete(
         cls, table: type[T_DatabaseModel], whereclause: ColumnExpressionArgument[bool]
-    ) -> None:
-        """指定資料庫 Table 與 where 條件，從資料庫刪除符合條件的物件，
+    ) -> int:
+        """指定資料庫 Table 與 where 條件，以單一 `DELETE ... WHERE` 敘述從資料庫刪除符合條件的物件，
         Example: `Database.delete(User, User.discord_id.is_(id))`
 
         Parameters
         ------
         table: `type[T_DatabaseModel]`
             要選擇的資料庫 Table (ORM) Class，Ex: `User`
-        whereclause: `ColumnExpressionArgument[bool]` | `None`
+        whereclause: `ColumnExpressionArgument[bool]`
             ORM Column 的 Where 選擇條件，Ex: `User.discord_id.is_(123456)`
+
+        Returns
+        ------
+        `int`:
+            被刪除的資料筆數
         """
-        instances = await cls.select_all(table, whereclause)
-        for instance in instances:
-            await cls.delete_instance(instance)
+        async with cls.transaction() as transaction:
+            return await transaction.delete(table, whereclause)
 
     @classmethod
     async def delete_all(cls, discord_id: Optional[int] = None, server_id: Optional[int] = None) -> None:
-        """指定使用者 discord_id，刪除此使用者在資料庫內的所有資料
+        """指定使用者 discord_id 或伺服器 server_id，在同一個交易內刪除此使用者或伺服器在資料庫內的所有資料
 
         Parameters
         ------
         discord_id: `int`
             使用者 Discord ID
+        server_id: `int`
+            伺服器 ID
         """
-        if discord_id is not None:
-            user = await cls.select_one(User, User.discord_id.is_(discord_id))
-            if user is None:
-                return
-            await cls.delete(WhiteList, WhiteList.user_id.is_(discord_id))
-            await cls.delete(BlackList, BlackList.user_id.is_(discord_id))
-            await cls.delete(UserConfiguration, UserConfiguration.discord_id.is_(discord_id))
-            await cls.delete(UserRecord, UserRecord.discord_id.is_(discord_id))
-            await cls.delete(User, User.discord_id.is_(discord_id))
-            await cls.delete(UserRecord, UserRecord.discord_id.is_(discord_id))
-            await cls.delete(Group, Group.owner_id.is_(discord_id))
-
-        if server_id is not None:
-            server = await cls.select_one(Server, Server.server_id.is_(server_id))
-            if server is None:
-                return
-            await cls.delete(ServerConfiguration, ServerConfiguration.server_id.is_(server_id))
-            await cls.delete(ServerTags, ServerTags.server_id.is_(server_id))
-            await cls.delete(Group, Group.server_id.is_(server_id))
\ No newline at end of file
+        async with cls.transaction() as transaction:
+            if discord_id is not None:
+                owner = [{"user_id": discord_id}]
+                user = [{"discord_id": discord_id}]
+                await transaction.delete(WhiteList, WhiteList.user_id.is_(discord_id), keys=owner)
+                await transaction.delete(BlackList, BlackList.user_id.is_(discord_id), keys=owner)
+                await transaction.delete(UserConfiguration, UserConfiguration.discord_id.is_(discord_id), keys=user)
+                await transaction.delete(UserRecord, UserRecord.discord_id.is_(discord_id), keys=user)
+                await transaction.delete(Group, Group.owner_id.is_(discord_id))
+                await transaction.delete(User, User.discord_id.is_(discord_id))
+
+            if server_id is not None:
+                await transaction.delete(ServerConfiguration, ServerConfiguration.server_id.is_(server_id))
+                await transaction.delete(ServerTags, ServerTags.server_id.is_(server_id))
+                await transaction.delete(Group, Group.server_id.is_(server_id))
+                await transaction.delete(Server, Server.server_id.is_(server_id))
@@ -0,0 +1,257 @@
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from types import MappingProxyType
+from typing import Any, Hashable, Iterable, Mapping
+
+import sqlalchemy
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from utility.prometheus import Metrics
+
+from .models import (
+    Base,
+    WhiteList,
+    BlackList,
+    ServerTags,
+    ServerConfiguration,
+    UserConfiguration,
+    UserRecord,
+    Group,
+)
+
+MISSING = object()
+"""快取內沒有該筆資料時 `RowCache.get`、`GuildConfigCache.get` 的回傳值，用來與快取住的 `None` 區分"""
+
+
+def copy_rows(value: Any) -> Any:
+    """複製 ORM 物件 (或 ORM 物件的列表)，複製出的物件為 detached 狀態，可以直接寫入或刪除，
+    快取只存放與回傳複本，呼叫端修改物件時不會影響快取，寫入失敗也不會讓快取與資料庫不一致
+    """
+    if isinstance(value, list):
+        return [copy_rows(row) for row in value]
+    if not isinstance(value, Base):
+        return value
+    mapper = sqlalchemy.inspect(type(value))
+    copy = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(copy, attr.key, deepcopy(getattr(value, attr.key)))
+    make_transient_to_detached(copy)
+    return copy
+
+
+class RowCache:
+    """以 (Table, Key) 為索引、有容量上限的 LRU 快取，每筆資料在寫入 `ttl` 秒後過期，
+    `key_columns` 定義每個 Table 以哪個欄位作為快取的 Key，例如 `WhiteList` 以擁有者 `user_id` 快取整份名單，
+    寫入與讀取時都會複製 ORM 物件 (見 `copy_rows`)
+    """
+
+    key_columns: dict[type[Base], str] = {
+        UserRecord: "discord_id",
+        UserConfiguration: "discord_id",
+        WhiteList: "user_id",
+        BlackList: "user_id",
+        Group: "owner_id",
+    }
+    """可被快取的 Table 與作為快取 Key 的欄位名稱"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        """每次失效都會遞增，讀取資料庫前記下此值，寫回快取時若不同表示期間有寫入，該次結果不寫入快取"""
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, table: type[Base], key: Hashable) -> Any:
+        """取得快取資料，若沒有或已過期則回傳 `MISSING`"""
+        entry = self._data.get((table, key))
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end((table, key))
+                Metrics.DB_CACHE_HITS.labels(self.name).inc()
+                return copy_rows(value)
+            del self._data[(table, key)]
+        Metrics.DB_CACHE_MISSES.labels(self.name).inc()
+        return MISSING
+
+    def set(self, table: type[Base], key: Hashable, value: Any, version: int | None = None) -> None:
+        """寫入快取資料的複本，若有傳入 `version` 且與目前版本不同，表示讀取期間資料已被修改，捨棄該值"""
+        if version is not None and version != self.version:
+            return
+        self._data[(table, key)] = (time.monotonic() + self.ttl, copy_rows(value))
+        self._data.move_to_end((table, key))
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            Metrics.DB_CACHE_EVICTIONS.labels(self.name).inc()
+
+    def invalidate(self, table: type[Base], row: Base | dict[str, Any]) -> None:
+        """資料 (ORM 物件或 {欄位名稱: 值} 的 dict) 被寫入或刪除後，使對應的快取資料失效"""
+        column = self.key_columns.get(table)
+        if column is None:
+            return
+        key = row[column] if isinstance(row, dict) else getattr(row, column)
+        self.version += 1
+        self._data.pop((table, key), None)
+
+    def invalidate_table(self, table: type[Base]) -> None:
+        """無法得知受影響的 Key 時 (例：`DELETE ... WHERE`)，使該 Table 的所有快取資料失效"""
+        if table not in self.key_columns:
+            return
+        self.version += 1
+        for key in [key for key in self._data if key[0] is table]:
+            del self._data[key]
+
+
+class GuildConfigCache:
+    """伺服器設定 (`ServerConfiguration`、`ServerTags`) 的快照，以 (Table, 伺服器 ID) 為索引，
+    快照本身是唯讀的 Mapping，每次寫入都複製出新的快照再整份替換，讀取時不會看到寫到一半的狀態，
+    放入與取出的 ORM 物件皆為複本 (見 `copy_rows`)，修改取得的設定不會影響快照，需寫入資料庫後才會更新
+    """
+
+    tables = (ServerConfiguration, ServerTags)
+    """快照包含的 Table"""
+
+    def __init__(self) -> None:
+        self.version = 0
+        """每次修改快照都會遞增，用途與 `RowCache.version` 相同"""
+        self._snapshot: Mapping[tuple[type[Base], int], Base | None] = MappingProxyType({})
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def get(self, table: type[Base], server_id: int) -> Any:
+        """取得伺服器設定的複本，若快照內沒有則回傳 `MISSING`"""
+        return copy_rows(self._snapshot.get((table, server_id), MISSING))
+
+    def replace(self, rows: dict[tuple[type[Base], int], Base | None]) -> None:
+        """以新的資料整份替換快照"""
+        self.version += 1
+        self._snapshot = MappingProxyType(dict(rows))
+
+    def set(self, table: type[Base], server_id: int, row: Base | None, version: int | None = None) -> None:
+        """寫入一筆伺服器設定，若有傳入 `version` 且與目前版本不同，表示讀取期間資料已被修改，捨棄該值"""
+        if version is not None and version != self.version:
+            return
+        snapshot = dict(self._snapshot)
+        snapshot[(table, server_id)] = copy_rows(row)
+        self.replace(snapshot)
+
+    def store(self, table: type[Base], row: Base | dict[str, Any]) -> None:
+        """資料被寫入後更新快照，ORM 物件直接放入快照，dict 則移除該筆，下次讀取時再從資料庫載入"""
+        if table not in self.tables:
+            return
+        if isinstance(row, dict):
+            self.discard(table, row["server_id"])
+        else:
+            self.set(table, row.server_id, row)
+
+    def discard(self, table: type[Base], server_id: int | None = None) -> None:
+        """從快照移除一筆伺服器設定，若未指定 `server_id` 則移除該 Table 的全部資料"""
+        if table not in self.tables:
+            return
+        self.replace({
+            key: row for key, row in self._snapshot.items()
+            if key[0] is not table or (server_id is not None and key[1] != server_id)
+        })
+
+
+class GroupChannelRegistry:
+    """目前所有房間的語音頻道 ID，用來在查詢資料庫前過濾掉不是房間的語音頻道，
+    由 `Database.load_group_channels` 載入，房間寫入或刪除時自動更新，
+    無法得知受影響的頻道時 (例：`DELETE ... WHERE`) 標記為未載入，下次查詢時重新載入
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.version = 0
+        """每次修改都會遞增，用途與 `RowCache.version` 相同"""
+        self.loaded = False
+        """是否已載入，未載入時無法判斷，需重新載入"""
+        self._channel_ids: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._channel_ids)
+
+    def __contains__(self, channel_id: int) -> bool:
+        """是否為房間的語音頻道，命中率記錄在 `DB_CACHE_HITS` / `DB_CACHE_MISSES`"""
+        if channel_id in self._channel_ids:
+            Metrics.DB_CACHE_HITS.labels(self.name).inc()
+            return True
+        Metrics.DB_CACHE_MISSES.labels(self.name).inc()
+        return False
+
+    def replace(self, channel_ids: Iterable[int], version: int | None = None) -> None:
+        """以新的資料整份替換，若有傳入 `version` 且與目前版本不同，表示讀取期間資料已被修改，捨棄該值"""
+        if version is not None and version != self.version:
+            return
+        self._channel_ids = set(channel_ids)
+        self.loaded = True
+
+    def add(self, channel_id: int) -> None:
+        self.version += 1
+        self._channel_ids.add(channel_id)
+
+    def discard(self, channel_id: int) -> None:
+        self.version += 1
+        self._channel_ids.discard(channel_id)
+
+    def invalidate(self) -> None:
+        """標記為未載入"""
+        self.version += 1
+        self.loaded = False
+
+
+class MembershipIndex:
+    """每位擁有者白名單、黑名單的成員 ID，以 (Table, 擁有者 ID) 為索引存放 frozenset，
+    判斷成員是否在名單內為 O(1)，由 `Database.list_members` 載入，名單被寫入或刪除時自動失效
+    """
+
+    tables = (WhiteList, BlackList)
+    """建立索引的 Table，皆以 `user_id` 為擁有者、`discord_id` 為成員"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.version = 0
+        """每次失效都會遞增，用途與 `RowCache.version` 相同"""
+        self._members: dict[tuple[type[Base], int], frozenset[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def get(self, table: type[Base], owner_id: int) -> Any:
+        """取得擁有者名單內的成員 ID，若尚未載入則回傳 `MISSING`"""
+        members = self._members.get((table, owner_id))
+        if members is None:
+            Metrics.DB_CACHE_MISSES.labels(self.name).inc()
+            return MISSING
+        Metrics.DB_CACHE_HITS.labels(self.name).inc()
+        return members
+
+    def set(self, table: type[Base], owner_id: int, member_ids: Iterable[int], version: int | None = None) -> frozenset[int]:
+        """寫入擁有者名單內的成員 ID，若有傳入 `version` 且與目前版本不同，表示讀取期間名單已被修改，不寫入索引"""
+        members = frozenset(member_ids)
+        if version is None or version == self.version:
+            self._members[(table, owner_id)] = members
+        return members
+
+    def invalidate(self, table: type[Base], row: Base | dict[str, Any]) -> None:
+        """名單資料 (ORM 物件或 {欄位名稱: 值} 的 dict) 被寫入或刪除後，使該擁有者的索引失效"""
+        if table not in self.tables:
+            return
+        owner_id = row["user_id"] if isinstance(row, dict) else row.user_id
+        self.version += 1
+        self._members.pop((table, owner_id), None)
+
+    def invalidate_table(self, table: type[Base]) -> None:
+        """無法得知受影響的擁有者時 (例：`DELETE ... WHERE`)，使該 Table 的所有索引失效"""
+        if table not in self.tables:
+            return
+        self.version += 1
+        for key in [key for key in self._members if key[0] is table]:
+            del self._members[key]
@@ -0,0 +1,130 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+from utility import LOG
+from utility.prometheus import Metrics
+
+from .app import Database, Transaction
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """將同一個事件迴圈週期內的查詢合併成一次批次查詢，相同 Key 的並發請求共用同一個 Future，
+    透過 `LoaderGroup` 排程，同一週期內所有 DataLoader 的批次查詢在同一個交易內執行
+
+    Parameters
+    ------
+    name: `str`
+        名稱，用於 Prometheus Metric 的 label
+    fetch: `Callable[[Transaction, list[K]], Awaitable[dict[K, V]]]`
+        批次查詢函式，傳入多個 Key，回傳 {Key: 值}，沒有出現在回傳中的 Key 以 `default()` 作為結果
+    default: `Callable[[], V]`
+        查無資料時的預設值
+    version: `Callable[[], int]` | `None`
+        批次查詢開始前取得快取版本，傳給 `store`
+    store: `Callable[[K, V, int], None]` | `None`
+        批次查詢完成後，將每個 Key 的結果寫回快取
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[Transaction, list[K]], Awaitable[dict[K, V]]],
+        default: Callable[[], V] = lambda: None,
+        version: Optional[Callable[[], int]] = None,
+        store: Optional[Callable[[K, V, int], None]] = None,
+    ) -> None:
+        self.name = name
+        self.fetch = fetch
+        self.default = default
+        self.version = version
+        self.store = store
+        self.group: Optional["LoaderGroup"] = None
+        self._futures: dict[K, asyncio.Future] = {}
+        """等待中與查詢中的 Key"""
+        self._queue: list[K] = []
+        """尚未送出查詢的 Key"""
+
+    def load(self, key: K) -> asyncio.Future:
+        """取得 Key 對應的值，若同一個 Key 已在等待或查詢中，直接共用該 Future，
+        回傳的 Future 經過 `asyncio.shield`，單一呼叫者被取消不會影響其他共用者
+        """
+        Metrics.DB_LOADER_KEYS.labels(self.name).inc()
+        future = self._futures.get(key)
+        if future is not None:
+            Metrics.DB_LOADER_COALESCED.labels(self.name).inc()
+            return asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        self._queue.append(key)
+        self.group.schedule()
+        return asyncio.shield(future)
+
+    def _take_queue(self) -> list[K]:
+        keys, self._queue = self._queue, []
+        return keys
+
+    async def _run(self, transaction: Transaction, keys: list[K]) -> dict[K, V]:
+        version = self.version() if self.version is not None else 0
+        results = await self.fetch(transaction, keys)
+        Metrics.DB_LOADER_BATCHES.labels(self.name).inc()
+        values = {key: results[key] if key in results else self.default() for key in keys}
+        if self.store is not None:
+            for key, value in values.items():
+                self.store(key, value, version)
+        return values
+
+    def _resolve(self, values: dict[K, V]) -> None:
+        for key, value in values.items():
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(value)
+
+    def _fail(self, keys: list[K], error: BaseException) -> None:
+        for key in keys:
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_exception(error)
+
+
+class LoaderGroup:
+    """一組共用排程的 DataLoader，第一個請求進來時排入下一個事件迴圈週期，
+    屆時將所有 DataLoader 累積的 Key 在同一個交易內各以一次查詢取得
+    """
+
+    def __init__(self, *loaders: DataLoader) -> None:
+        self.loaders = loaders
+        for loader in loaders:
+            loader.group = self
+        self._scheduled = False
+        self._tasks: set[asyncio.Task] = set()
+
+    def schedule(self) -> None:
+        if self._scheduled:
+            return
+        self._scheduled = True
+        asyncio.get_running_loop().call_soon(self._dispatch)
+
+    def _dispatch(self) -> None:
+        self._scheduled = False
+        batches = [(loader, loader._take_queue()) for loader in self.loaders if loader._queue]
+        if not batches:
+            return
+        task = asyncio.create_task(self._run(batches))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batches: list[tuple[DataLoader, list[Any]]]) -> None:
+        try:
+            async with Database.transaction(readonly=True) as transaction:
+                results = [(loader, await loader._run(transaction, keys)) for loader, keys in batches]
+        except Exception as e:
+            LOG.Error(f"database: 批次查詢失敗: {e}")
+            for loader, keys in batches:
+                loader._fail(keys, e)
+            return
+        for loader, values in results:
+            loader._resolve(values)
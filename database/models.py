@@ -2,6 +2,7 @@ import sqlalchemy
 from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column, relationship
 from sqlalchemy import ForeignKey
 from typing import List
+from datetime import datetime
 
 
 class Base(MappedAsDataclass, DeclarativeBase):
@@ -13,26 +14,29 @@ class WhiteList(Base):
     __tablename__ = "white_list"
 
 
-    discord_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), primary_key=True)
-    """白名單 Discord ID"""
-
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), primary_key=True, nullable=False)
     """對應使用者 Discord ID"""
 
+    discord_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), primary_key=True, nullable=False, index=True)
+    """白名單 Discord ID"""
+
 
 class BlackList(Base):
     __tablename__ = "black_list"
 
 
-    discord_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), primary_key=True)
-    """黑名單 Discord ID"""
-
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), primary_key=True, nullable=False)
     """對應使用者 Discord ID"""
 
+    discord_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), primary_key=True, nullable=False, index=True)
+    """黑名單 Discord ID"""
+
 
 class Group(Base):
     __tablename__ = "group"
+    __table_args__ = (
+        sqlalchemy.Index("ix_group_server_id_voice_channel_id", "server_id", "voice_channel_id"),
+    )
 
 
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.discord_id"), primary_key=True, nullable=False)
@@ -49,6 +53,9 @@ class Group(Base):
 
     description_message_id: Mapped[int] = mapped_column(nullable=False)
 
+    delete_deadline: Mapped[datetime | None] = mapped_column(default=None, nullable=True)
+    """語音頻道沒人時自動刪除的期限 (UTC)，頻道有人時為 None，重新啟動後從此時間繼續倒數"""
+
 class ServerTags(Base):
     __tablename__ = "server_tags"
 
@@ -174,6 +181,9 @@ class User(Base):
     name: Mapped[str | None] = mapped_column(default=None)
     """使用者名稱"""
 
+    last_active_at: Mapped[datetime | None] = mapped_column(default=None, index=True)
+    """最後一次使用指令或互動的時間 (UTC)，註冊時設為註冊時間，超過 `config.expired_user_days` 天的使用者會被刪除"""
+
     configuration = relationship("UserConfiguration", back_populates="user", uselist=False)
     """使用者設定資料"""
 
@@ -0,0 +1,109 @@
+from typing import Final
+
+import sqlalchemy
+from sqlalchemy import Select, Update, bindparam
+
+from .models import (
+    Base,
+    WhiteList,
+    BlackList,
+    ServerTags,
+    ServerConfiguration,
+    UserConfiguration,
+    User,
+    UserRecord,
+    Group,
+)
+
+
+def _select_in(table: type[Base], column: str) -> Select:
+    """`SELECT ... WHERE column IN (:keys)`，`keys` 為展開參數，不論 Key 的數量都共用同一個敘述與編譯快取"""
+    return sqlalchemy.select(table).where(getattr(table, column).in_(bindparam("keys", expanding=True)))
+
+
+class Statements:
+    """固定使用的查詢敘述，在載入時建構一次，執行時只綁定參數，
+    搭配 `Database.scalars` 或 `Transaction.scalars` 使用，
+    Example: `await Database.scalars(Statements.GROUP_BY_OWNER, {"server_id": 1, "owner_id": 2})`
+    """
+
+    GROUPS_BY_OWNER_IDS: Final[Select] = _select_in(Group, "owner_id")
+    """參數 `keys`：擁有者 ID 列表"""
+
+    USER_RECORDS_BY_IDS: Final[Select] = _select_in(UserRecord, "discord_id")
+    """參數 `keys`：使用者 ID 列表"""
+
+    USER_CONFIGS_BY_IDS: Final[Select] = _select_in(UserConfiguration, "discord_id")
+    """參數 `keys`：使用者 ID 列表"""
+
+    SERVER_CONFIGS_BY_IDS: Final[Select] = _select_in(ServerConfiguration, "server_id")
+    """參數 `keys`：伺服器 ID 列表"""
+
+    SERVER_TAGS_BY_IDS: Final[Select] = _select_in(ServerTags, "server_id")
+    """參數 `keys`：伺服器 ID 列表"""
+
+    BLACK_LISTS_BY_OWNER_IDS: Final[Select] = _select_in(BlackList, "user_id")
+    """參數 `keys`：名單擁有者 ID 列表"""
+
+    WHITE_LISTS_BY_OWNER_IDS: Final[Select] = _select_in(WhiteList, "user_id")
+    """參數 `keys`：名單擁有者 ID 列表"""
+
+    WHITE_LIST_MEMBER_IDS: Final[Select] = sqlalchemy.select(WhiteList.discord_id).where(
+        WhiteList.user_id == bindparam("owner_id")
+    )
+    """參數 `owner_id`：擁有者白名單內的成員 ID"""
+
+    BLACK_LIST_MEMBER_IDS: Final[Select] = sqlalchemy.select(BlackList.discord_id).where(
+        BlackList.user_id == bindparam("owner_id")
+    )
+    """參數 `owner_id`：擁有者黑名單內的成員 ID"""
+
+    GROUP_BY_OWNER: Final[Select] = sqlalchemy.select(Group).where(
+        Group.server_id == bindparam("server_id"), Group.owner_id == bindparam("owner_id")
+    )
+    """參數 `server_id`、`owner_id`：伺服器內某位使用者的房間"""
+
+    GROUP_BY_VOICE_CHANNEL: Final[Select] = sqlalchemy.select(Group).where(
+        Group.server_id == bindparam("server_id"), Group.voice_channel_id == bindparam("voice_channel_id")
+    )
+    """參數 `server_id`、`voice_channel_id`：語音頻道對應的房間"""
+
+    SET_GROUP_DELETE_DEADLINE: Final[Update] = (
+        sqlalchemy.update(Group)
+        .where(
+            Group.owner_id == bindparam("owner"),
+            Group.server_id == bindparam("server"),
+            Group.voice_channel_id == bindparam("voice_channel"),
+        )
+        .values(delete_deadline=bindparam("deadline"))
+        .execution_options(synchronize_session=False)
+    )
+    """參數 `owner`、`server`、`voice_channel`、`deadline`：只更新房間的刪除期限，`deadline` 為 `None` 時清除，
+    參數名稱不可與欄位名稱相同，因此不使用 `owner_id` 等名稱"""
+
+    SET_GROUP_DESCRIPTION_MESSAGE: Final[Update] = (
+        sqlalchemy.update(Group)
+        .where(
+            Group.owner_id == bindparam("owner"),
+            Group.server_id == bindparam("server"),
+            Group.voice_channel_id == bindparam("voice_channel"),
+        )
+        .values(description_message_id=bindparam("message_id"))
+        .execution_options(synchronize_session=False)
+    )
+    """參數 `owner`、`server`、`voice_channel`、`message_id`：只更新房間的說明訊息 ID"""
+
+    USER_IDS: Final[Select] = sqlalchemy.select(User.discord_id)
+    """所有已註冊的使用者 ID"""
+
+    EXPIRED_USER_IDS: Final[Select] = (
+        sqlalchemy.select(User.discord_id)
+        .where(
+            User.last_active_at < bindparam("cutoff"),
+            User.discord_id.not_in(sqlalchemy.select(Group.owner_id)),
+            User.discord_id.not_in(sqlalchemy.select(WhiteList.discord_id)),
+            User.discord_id.not_in(sqlalchemy.select(BlackList.discord_id)),
+        )
+        .limit(bindparam("limit"))
+    )
+    """參數 `cutoff`、`limit`：最後活躍時間早於 `cutoff`、沒有房間且不在任何人的黑白名單內的使用者 ID，最多 `limit` 筆"""
@@ -0,0 +1,110 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, AsyncContextManager, Callable, Hashable, Optional
+
+import sqlalchemy
+
+from utility import LOG
+from utility.prometheus import Metrics
+
+from .cache import MISSING
+from .models import Base
+
+
+class WriteBehindQueue:
+    """延遲寫入佇列，寫入先放進佇列並立即返回，同一個 Primary Key 的多次寫入只保留最後一次，
+    每隔 `interval` 秒或累積超過 `max_pending` 筆時，在同一個交易內批次寫入資料庫
+
+    Parameters
+    ------
+    interval: `float`
+        定時寫入的間隔（單位：秒）
+    max_pending: `int`
+        佇列累積超過此筆數時立即寫入
+    transaction: `Callable[[], AsyncContextManager]`
+        開啟交易的函式，通常為 `Database.transaction`
+    """
+
+    def __init__(self, interval: float, max_pending: int, transaction: Callable[[], AsyncContextManager]) -> None:
+        self.interval = interval
+        self.max_pending = max_pending
+        self.transaction = transaction
+        self._pending: dict[tuple[type[Base], Hashable], Base] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_tasks: set[asyncio.Task] = set()
+        self._closing = asyncio.Event()
+        """設定後定時寫入的協程在目前的寫入完成後結束，不會在寫入途中被取消"""
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @staticmethod
+    def _key(table: type[Base], instance: Base) -> tuple[type[Base], Hashable]:
+        return table, tuple(sqlalchemy.inspect(table).primary_key_from_instance(instance))
+
+    def put(self, instance: Base) -> None:
+        """將物件放入佇列，若佇列內已有相同 Primary Key 的物件，則以新物件取代"""
+        table = type(instance)
+        self._pending[self._key(table, instance)] = instance
+        Metrics.DB_WRITE_BEHIND_QUEUED.inc()
+        Metrics.DB_WRITE_BEHIND_PENDING.set(len(self._pending))
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if len(self._pending) >= self.max_pending:
+            task = asyncio.create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    def discard(self, instance: Base) -> None:
+        """移除佇列內與該物件相同 Primary Key 的物件，該物件將直接寫入資料庫時使用，避免較舊的佇列資料覆蓋"""
+        if self._pending.pop(self._key(type(instance), instance), None) is not None:
+            Metrics.DB_WRITE_BEHIND_PENDING.set(len(self._pending))
+
+    def get(self, table: type[Base], *primary_key: Any) -> Any:
+        """取得佇列內尚未寫入的物件，若沒有則回傳 `MISSING`"""
+        return self._pending.get((table, primary_key), MISSING)
+
+    async def flush(self) -> None:
+        """將佇列內的全部物件在同一個交易內寫入資料庫，失敗或被取消時放回佇列等待下次寫入"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+            tables: dict[type[Base], list[Base]] = defaultdict(list)
+            for (table, _), instance in pending.items():
+                tables[table].append(instance)
+            written = False
+            try:
+                async with self.transaction() as transaction:
+                    for table, instances in tables.items():
+                        await transaction.upsert(table, instances)
+                written = True
+                Metrics.DB_WRITE_BEHIND_FLUSHED.inc(len(pending))
+            except Exception as e:
+                LOG.Error(f"database: 延遲寫入失敗，{len(pending)} 筆資料將在下次重試: {e}")
+            finally:
+                if not written:
+                    # 佇列內較新的寫入優先，不覆蓋
+                    for key, instance in pending.items():
+                        self._pending.setdefault(key, instance)
+                Metrics.DB_WRITE_BEHIND_PENDING.set(len(self._pending))
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.interval)
+            except TimeoutError:
+                await self.flush()
+
+    async def close(self) -> None:
+        """停止定時寫入，等待進行中的寫入完成後，將佇列內剩餘的物件全部寫入資料庫"""
+        self._closing.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
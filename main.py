@@ -42,6 +42,8 @@ class REPODiscordBot(commands.AutoShardedBot):
 
         # 初始化資料庫
         await database.Database.init()
+        await database.Database.load_guild_configs()
+        await database.Database.load_group_channels()
 
 
         # 從 cogs 資料夾載入所有 cog
@@ -81,6 +83,12 @@ class REPODiscordBot(commands.AutoShardedBot):
 
     async def on_command(self, ctx: commands.Context):
         LOG.CmdResult(ctx)
+        database.Database.activity.touch(ctx.author.id)
+
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        # 只記錄在記憶體，由 Database.activity 定時批次寫回
+        database.Database.activity.touch(interaction.user.id)
 
 
     async def on_command_error(self, ctx: commands.Context, error):
@@ -1,8 +1,12 @@
+import asyncio
+from collections import defaultdict
+from datetime import timedelta
 from typing import Optional, Any, List
 import discord
-from database import Database, UserRecord, UserConfiguration, ServerConfiguration, ServerTags, WhiteList, BlackList, Group
+from database import Database, Transaction, DataLoader, LoaderGroup, MISSING, copy_rows, Statements, utcnow, Base, User, UserRecord, UserConfiguration, ServerConfiguration, ServerTags, WhiteList, BlackList, Group
 import sqlalchemy
-from utility import LOG
+from utility import LOG, config
+from utility.prometheus import Metrics
 
 _UNSET = object()  # 特殊標記用於檢測未傳入參數
 
@@ -19,63 +23,115 @@ class FilledData:
         attrs = [f'{k}={getattr(self, k)!r}' for k in self.__slots__ if hasattr(self, k)]
         return f'FilledData({", ".join(attrs)})'
 
-class DatabaseManager:
-    @classmethod
-    async def _resolve_value(
-        cls,
-        user_id: int,
-        guild_id: int,
-        value: Any,
-        field_name: str
-    ) -> Any:
-        """核心解析邏輯"""
-        if value is not None:  # 非 None 直接返回
-            return value
-            
-        # 根據字段名稱執行不同解析邏輯
-        resolver = {
-            'group': cls._fetch_group,
-            'user_record': cls._fetch_user_record,
-            'user_config': cls._fetch_user_config,
-            'server_config': cls._fetch_server_config,
-            'server_tags': cls._fetch_server_tags,
-            'black_list': cls._fetch_black_list,
-            'white_list': cls._fetch_white_list
-        }.get(field_name)
-        
-        return await resolver(user_id, guild_id) if resolver else None
+def _fetch_one_by(statement: sqlalchemy.Select, column: str):
+    """建立批次查詢函式：以預先建構的 `column IN (:keys)` 敘述查詢，每個 Key 取第一筆資料"""
+    async def fetch(transaction: Transaction, keys: list[int]) -> dict[int, Base]:
+        rows = await transaction.scalars(statement, {"keys": keys})
+        results = {}
+        for row in rows:
+            results.setdefault(getattr(row, column), row)
+        return results
+    return fetch
 
-    @staticmethod
-    async def _fetch_group(user_id: int, guild_id: int) -> Group:
-        """獲取用戶的群組"""
-        return await Database.select_one(Group, Group.owner_id.is_(user_id))
 
-    @staticmethod
-    async def _fetch_user_record(user_id: int, guild_id: int) -> UserRecord:
-        """獲取用戶記錄"""
-        return await Database.select_one(UserRecord, UserRecord.discord_id.is_(user_id))
-    @staticmethod
-    async def _fetch_user_config(user_id: int, guild_id: int) -> UserConfiguration:
-        """獲取用戶配置"""
-        return await Database.select_one(UserConfiguration, UserConfiguration.discord_id.is_(user_id))
+def _fetch_all_by(statement: sqlalchemy.Select, column: str):
+    """建立批次查詢函式：以預先建構的 `column IN (:keys)` 敘述查詢，每個 Key 取得全部資料的列表"""
+    async def fetch(transaction: Transaction, keys: list[int]) -> dict[int, list[Base]]:
+        rows = await transaction.scalars(statement, {"keys": keys})
+        results = defaultdict(list)
+        for row in rows:
+            results[getattr(row, column)].append(row)
+        return results
+    return fetch
 
-    @staticmethod
-    async def _fetch_server_config(user_id: int, guild_id: int) -> ServerConfiguration:
-        """獲取伺服器配置"""
-        return await Database.select_one(ServerConfiguration, ServerConfiguration.server_id.is_(guild_id))
+
+def _user_loader(table: type[Base], statement: sqlalchemy.Select, column: str, many: bool = False) -> DataLoader:
+    """以使用者 ID 查詢的 DataLoader，結果寫回使用者資料快取"""
+    return DataLoader(
+        name=table.__tablename__,
+        fetch=_fetch_all_by(statement, column) if many else _fetch_one_by(statement, column),
+        default=list if many else lambda: None,
+        version=lambda: Database.cache.version,
+        store=lambda key, value, version: Database.cache.set(table, key, value, version),
+    )
+
+
+def _guild_loader(table: type[Base], statement: sqlalchemy.Select) -> DataLoader:
+    """以伺服器 ID 查詢的 DataLoader，結果寫回伺服器設定快照"""
+    return DataLoader(
+        name=table.__tablename__,
+        fetch=_fetch_one_by(statement, "server_id"),
+        version=lambda: Database.guild_configs.version,
+        store=lambda key, value, version: Database.guild_configs.set(table, key, value, version),
+    )
+
+
+_loaders: dict[str, DataLoader] = {
+    'group': _user_loader(Group, Statements.GROUPS_BY_OWNER_IDS, "owner_id"),
+    'user_record': _user_loader(UserRecord, Statements.USER_RECORDS_BY_IDS, "discord_id"),
+    'user_config': _user_loader(UserConfiguration, Statements.USER_CONFIGS_BY_IDS, "discord_id"),
+    'server_config': _guild_loader(ServerConfiguration, Statements.SERVER_CONFIGS_BY_IDS),
+    'server_tags': _guild_loader(ServerTags, Statements.SERVER_TAGS_BY_IDS),
+    'black_list': _user_loader(BlackList, Statements.BLACK_LISTS_BY_OWNER_IDS, "user_id", many=True),
+    'white_list': _user_loader(WhiteList, Statements.WHITE_LISTS_BY_OWNER_IDS, "user_id", many=True),
+}
+"""各欄位的 DataLoader"""
+_loader_group = LoaderGroup(*_loaders.values())
+
+
+class DatabaseManager:
+    _cached_tables = {
+        'group': Group,
+        'user_record': UserRecord,
+        'user_config': UserConfiguration,
+        'black_list': BlackList,
+        'white_list': WhiteList,
+    }
+    """以使用者 ID 快取的欄位與對應的 Table"""
+    _guild_tables = {
+        'server_config': ServerConfiguration,
+        'server_tags': ServerTags,
+    }
+    """從伺服器設定快照讀取的欄位與對應的 Table"""
+    _deferred_tables = {
+        'user_record': UserRecord,
+        'user_config': UserConfiguration,
+    }
+    """可延遲寫入的欄位與對應的 Table，Primary Key 皆為使用者 ID"""
+
+    @classmethod
+    def _get_cached(cls, user_id: int, guild_id: int, field_name: str) -> Any:
+        """伺服器設定從快照讀取，使用者相關資料先查延遲寫入佇列再查快取，皆沒有則回傳 `MISSING`"""
+        table = cls._guild_tables.get(field_name)
+        if table is not None:
+            return Database.guild_configs.get(table, guild_id)
+        table = cls._deferred_tables.get(field_name)
+        if table is not None:
+            pending = Database.write_behind.get(table, user_id)
+            if pending is not MISSING:
+                # 回傳複本，呼叫端修改物件時不會改到佇列內尚未寫入的資料
+                return copy_rows(pending)
+        table = cls._cached_tables.get(field_name)
+        if table is not None:
+            return Database.cache.get(table, user_id)
+        return MISSING
 
     @staticmethod
-    async def _fetch_black_list(user_id: int, guild_id: int) -> list[BlackList]:
-        """獲取黑名單"""
-        return await Database.select_all(BlackList,  BlackList.user_id.is_(user_id))
-    @staticmethod
-    async def _fetch_white_list(user_id: int, guild_id: int) -> list[WhiteList]:
-        """獲取白名單"""
-        return await Database.select_all(WhiteList, WhiteList.user_id.is_(user_id))
+    async def register_user(user_id: int) -> tuple[UserRecord, UserConfiguration]:
+        """註冊使用者，已存在的資料不會被覆蓋，只更新最後活躍時間，回傳使用者的紀錄與設定"""
+        async with Database.transaction() as transaction:
+            await transaction.upsert(User, {"discord_id": user_id, "last_active_at": utcnow()})
+            await transaction.upsert(UserConfiguration, {"discord_id": user_id})
+            await transaction.upsert(UserRecord, {"discord_id": user_id})
+            user_record = await transaction.select_one(UserRecord, UserRecord.discord_id == user_id)
+            user_config = await transaction.select_one(UserConfiguration, UserConfiguration.discord_id == user_id)
+        LOG.System(f"重新註冊使用者: {LOG.User(user_id)}")
+        return user_record, user_config
+
     @staticmethod
-    async def _fetch_server_tags(user_id: int, guild_id: int) -> ServerTags:
-        """獲取伺服器標籤"""
-        return await Database.select_one(ServerTags, ServerTags.server_id.is_(guild_id))
+    async def fetch_list_members(table: type[WhiteList] | type[BlackList], owner_id: int) -> frozenset[int]:
+        """擁有者白名單或黑名單內的成員 ID，從 `Database.memberships` 索引讀取，尚未載入時才查詢資料庫"""
+        return await Database.list_members(table, owner_id)
     
     
     @classmethod
@@ -91,8 +147,12 @@ class DatabaseManager:
         black_list: Optional[BlackList] = _UNSET,
         white_list: Optional[WhiteList] = _UNSET
     ) -> FilledData:
-        """主要入口方法"""
+        """主要入口方法
+        有傳入值的欄位直接使用，傳入 `None` 的欄位先查詢快照與快取，
+        剩下需要讀取資料庫的欄位交給 DataLoader，與同一週期內其他請求合併後，在同一個交易內批次查詢
+        """
         resolved = {}
+        pending = []
         
         # 處理每個可選參數
         for field, value in [
@@ -106,13 +166,29 @@ class DatabaseManager:
         ]:
             if value is _UNSET:
                 continue  # 跳過未傳入的參數
-                
-            resolved[field] = await cls._resolve_value(
-                user_id=user_id,
-                guild_id=guild_id,
-                value=value,
-                field_name=field
-            )
+            if value is not None:  # 非 None 直接使用
+                resolved[field] = value
+                continue
+
+            cached = cls._get_cached(user_id, guild_id, field)
+            if cached is not MISSING:
+                resolved[field] = cached
+            else:
+                pending.append(field)
+
+        if pending:
+            futures = [
+                _loaders[field].load(guild_id if field in cls._guild_tables else user_id)
+                for field in pending
+            ]
+            resolved.update(zip(pending, await asyncio.gather(*futures)))
+
+        if any(resolved.get(field, _UNSET) is None for field in ('user_record', 'user_config')):
+            # 使用者已被刪除 (例：超過期限未活動) 後再次互動，重新註冊
+            user_record, user_config = await cls.register_user(user_id)
+            for field, value in (('user_record', user_record), ('user_config', user_config)):
+                if resolved.get(field, _UNSET) is None:
+                    resolved[field] = value
 
         return FilledData(user_id=user_id, guild_id=guild_id, **resolved)
     
@@ -124,9 +200,12 @@ class DatabaseManager:
         user_config: Optional[UserConfiguration] = _UNSET,
         server_config: Optional[ServerConfiguration] = _UNSET,
         server_tags: Optional[ServerConfiguration] = _UNSET,
+        transaction: Optional[Transaction] = None,
     ) -> None:
         """通用儲存方法
-        只儲存有傳入的參數，使用 insert_or_replace 操作
+        只儲存有傳入的參數，使用 insert_or_replace 操作，所有參數在同一個交易內提交，
+        若有傳入 `transaction` 則加入該交易，由呼叫者負責提交，
+        延遲寫入的 Table 會先移除佇列內相同 Primary Key 的舊資料
         """
         # 過濾掉未傳入的參數 (_UNSET)
         params = {
@@ -137,9 +216,44 @@ class DatabaseManager:
             'server_tags': server_tags
         }
         
-        for name, value in params.items():
-            if value is not _UNSET:
-                await Database.insert_or_replace(value)
+        values = [value for value in params.values() if value is not _UNSET]
+        for value in values:
+            if type(value) in cls._deferred_tables.values():
+                # 直接寫入的資料較新，移除延遲寫入佇列內的舊資料
+                Database.write_behind.discard(value)
+        if transaction is not None:
+            for value in values:
+                await transaction.insert_or_replace(value)
+            return
+
+        async with Database.transaction() as transaction:
+            for value in values:
+                await transaction.insert_or_replace(value)
+
+
+    @classmethod
+    async def queue_data(
+        cls,
+        user_record: Optional[UserRecord] = _UNSET,
+        user_config: Optional[UserConfiguration] = _UNSET,
+        transaction: Optional[Transaction] = None,
+    ) -> None:
+        """延遲儲存使用者狀態
+        `config.write_behind_enabled` 為 True 時放入延遲寫入佇列並立即返回，同一使用者的多次寫入只會寫入最後一次，
+        否則等同 `save_data`，若有傳入 `transaction` 則加入該交易
+        """
+        if not config.write_behind_enabled:
+            await cls.save_data(user_record=user_record, user_config=user_config, transaction=transaction)
+            return
+
+        for value in (user_record, user_config):
+            if value is _UNSET:
+                continue
+            table = type(value)
+            Database.write_behind.put(value)
+            # 使進行中的查詢結果不寫回快取，並直接以新值更新快取
+            Database.cache.invalidate(table, value)
+            Database.cache.set(table, value.discord_id, value)
 
 
     @classmethod
@@ -148,8 +262,12 @@ class DatabaseManager:
         group: Optional[Group] = _UNSET,
         white_list: Optional[WhiteList] = _UNSET,
         black_list: Optional[BlackList] = _UNSET,
+        transaction: Optional[Transaction] = None,
     ) -> None:
-
+        """通用刪除方法
+        只刪除有傳入的參數，所有參數在同一個交易內提交，
+        若有傳入 `transaction` 則加入該交易，由呼叫者負責提交
+        """
         # 過濾掉未傳入的參數 (_UNSET)
         params = {
             'group': group,
@@ -157,6 +275,45 @@ class DatabaseManager:
             'black_list': black_list,
         }
         
-        for name, value in params.items():
-            if value is not _UNSET:
-                await Database.delete_instance(value)
\ No newline at end of file
+        values = [value for value in params.values() if value is not _UNSET]
+        if transaction is not None:
+            for value in values:
+                await transaction.delete_instance(value)
+            return
+
+        async with Database.transaction() as transaction:
+            for value in values:
+                await transaction.delete_instance(value)
+
+    @classmethod
+    async def prune_expired_users(cls, days: int, chunk_size: int) -> int:
+        """刪除超過 `days` 天沒有活動、沒有房間且不在任何人黑白名單內的使用者，連同設定、紀錄與自己擁有的黑白名單，
+        每個交易最多刪除 `chunk_size` 位使用者，交易之間讓出事件迴圈，其他寫入可以插隊，回傳刪除的使用者數量
+        """
+        cutoff = utcnow() - timedelta(days=days)
+        pruned = 0
+        while True:
+            async with Database.transaction() as transaction:
+                user_ids = await transaction.scalars(
+                    Statements.EXPIRED_USER_IDS, {"cutoff": cutoff, "limit": chunk_size}
+                )
+                if not user_ids:
+                    break
+                users = [{"discord_id": user_id} for user_id in user_ids]
+                owners = [{"user_id": user_id} for user_id in user_ids]
+                await transaction.delete(UserConfiguration, UserConfiguration.discord_id.in_(user_ids), keys=users)
+                await transaction.delete(UserRecord, UserRecord.discord_id.in_(user_ids), keys=users)
+                for model in (WhiteList, BlackList):
+                    await transaction.delete(model, model.user_id.in_(user_ids), keys=owners)
+                await transaction.delete(User, User.discord_id.in_(user_ids))
+
+            pruned += len(user_ids)
+            Metrics.DB_USERS_PRUNED.inc(len(user_ids))
+            await asyncio.sleep(0)
+
+        for table in (User, UserConfiguration, UserRecord):
+            count = await Database.scalar(sqlalchemy.select(sqlalchemy.func.count()).select_from(table))
+            Metrics.DB_TABLE_ROWS.labels(table.__tablename__).set(count)
+            if table is User:
+                Metrics.USERS.set(count)
+        return pruned
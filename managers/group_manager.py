@@ -1,4 +1,6 @@
 import asyncio
+import functools
+from datetime import timedelta
 from typing import List, Optional
 
 import discord
@@ -7,11 +9,15 @@ from discord.ext import commands
 
 from database import (
     Database, 
+    Statements,
+    utcnow,
     Group, 
     UserRecord,
     ServerTags,
     UserConfiguration, 
     ServerConfiguration,
+    WhiteList,
+    BlackList,
 )
 
 from .ui.thread_menu import ThreadMenuNav
@@ -36,6 +42,8 @@ from utility import LOG, TimeoutOperation
 class GroupManager:
     enter_password = EnterPasswordModal
     tag_manager = TagManager
+    AUTO_DELETE_TIMEOUT = 60
+    """語音頻道沒人後自動刪除房間的時間（秒）"""
 
     async def create(
         interaction: discord.Interaction,
@@ -213,12 +221,16 @@ class GroupManager:
         )
         
 
-        await DatabaseManager.save_data(
-            user_record=user_record,
-            user_config=user_config,
-        )
-
-        await DatabaseManager.delete_data(group=group)
+        async with Database.transaction() as transaction:
+            await DatabaseManager.queue_data(
+                user_record=user_record,
+                user_config=user_config,
+                transaction=transaction,
+            )
+            await DatabaseManager.delete_data(
+                group=group,
+                transaction=transaction,
+            )
 
         LOG.System(f"使用者{LOG.User(user_id)}刪除房間成功")
 
@@ -234,12 +246,8 @@ class GroupManager:
         user = interaction.user
         await interaction.response.send_message(
             embed=EmbedManager.update_group(),ephemeral=True,)
-        group = await Database.select_one(
-            Group,
-            sqlalchemy.and_(
-                Group.server_id == guild.id,
-                Group.owner_id == user.id
-            )
+        group = await Database.scalar(
+            Statements.GROUP_BY_OWNER, {"server_id": guild.id, "owner_id": user.id}
         )
         if group is None:
             return
@@ -292,9 +300,13 @@ class GroupManager:
                 )
             )
             group.description_message_id = description_message.id
-            await DatabaseManager.save_data(
-                group=group,
-            )
+            # 只更新訊息 ID，避免以較舊的物件覆蓋刪除期限等其他欄位
+            await Database.update(Group, Statements.SET_GROUP_DESCRIPTION_MESSAGE, {
+                "owner": group.owner_id,
+                "server": group.server_id,
+                "voice_channel": group.voice_channel_id,
+                "message_id": description_message.id,
+            }, keys=[{"owner_id": group.owner_id}])
         await description_message.edit(
             embed=EmbedManager.description(
                 user_record=user_record,
@@ -340,22 +352,20 @@ class GroupManager:
         try:
             guild = interaction.guild
             user = interaction.user
-            white_list = []
-            black_list = []
+            white_list = frozenset()
+            black_list = frozenset()
 
             if limit_mode == 1:
                 # 白名單模式
-                white_list = None
+                white_list = await DatabaseManager.fetch_list_members(WhiteList, user.id)
             elif limit_mode == 2:
                 # 黑名單模式
-                black_list = None
+                black_list = await DatabaseManager.fetch_list_members(BlackList, user.id)
 
             filled_data = await DatabaseManager.fill_missing_data(
                 guild_id=guild.id,
                 user_id=user.id,
                 user_config=None,
-                white_list=white_list,
-                black_list=black_list,
             )
             
             user_config: UserConfiguration = filled_data.user_config
@@ -374,20 +384,20 @@ class GroupManager:
                 guild=guild,
                 user=user,
                 voice_channel=voice_channel,
-                white_list=filled_data.white_list,
-                black_list=filled_data.black_list,
+                white_list=white_list,
+                black_list=black_list,
                 limit_mode=limit_mode,
             )
             await VoiceChannelManager.change_limit(
                 guild=guild,
                 user=user,
                 voice_channel=voice_channel,
-                white_list=filled_data.white_list,
-                black_list=filled_data.black_list,
+                white_list=white_list,
+                black_list=black_list,
                 limit_mode=limit_mode,
             )
             user_config.limit_mode = limit_mode
-            await DatabaseManager.save_data(user_config=user_config)
+            await DatabaseManager.queue_data(user_config=user_config)
 
         except Exception as e:
             LOG.Error(f"更改權限失敗: {e}")
@@ -430,12 +440,18 @@ class GroupManager:
             user_id=owner.id,
             server_config=None,
             user_config=None,
-            white_list=None,
-            black_list=None,
         )
         
         user_config: UserConfiguration = filled_data.user_config
         server_config: ServerConfiguration = filled_data.server_config
+
+        # 擁有者名單的成員 ID 索引，載入後判斷不需查詢資料庫
+        white_list = frozenset()
+        black_list = frozenset()
+        if user_config.limit_mode == 1:
+            white_list = await DatabaseManager.fetch_list_members(WhiteList, owner.id)
+        elif user_config.limit_mode == 2:
+            black_list = await DatabaseManager.fetch_list_members(BlackList, owner.id)
         
         waiting_voice = guild.get_channel(server_config.waiting_room_channel)
 
@@ -474,8 +490,8 @@ class GroupManager:
                 limit_mode=user_config.limit_mode,
                 voice_channel=voice_channel,
                 parent=GroupManager,
-                white_list=filled_data.white_list,
-                black_list=filled_data.black_list,
+                white_list=white_list,
+                black_list=black_list,
                 password=user_config.group_password,
             )
             LOG.Debug(f"1")
@@ -620,37 +636,60 @@ class GroupManager:
     async def auto_delete_voice_channel(
         guild: discord.Guild,
         voice_channel: discord.VoiceChannel,
+        group: Optional[Group] = None,
     ) -> None:
         """
         自動刪除語音頻道的邏輯。
-        如果語音頻道沒人，啟動計時器；如果有人，取消計時器。
+        如果語音頻道沒人，啟動計時器並記錄刪除期限；如果有人，取消計時器並清除刪除期限。
+        已記錄刪除期限的房間 (例：重新啟動前就沒人) 從剩餘時間繼續倒數。
 
         :param guild: Discord 伺服器
         :param voice_channel: Discord 語音頻道
+        :param group: 語音頻道對應的房間，未傳入則從資料庫查詢
         """
-        group = await Database.select_one(
-            Group,
-            sqlalchemy.and_(
-                Group.server_id.is_(guild.id),
-                Group.voice_channel_id.is_(voice_channel.id)
-            )
-        )
         if group is None:
-            return
+            # 不是房間的語音頻道 (例：待機頻道) 不需查詢資料庫
+            if not await Database.is_group_channel(voice_channel.id):
+                return
+
+            group = await Database.scalar(
+                Statements.GROUP_BY_VOICE_CHANNEL, {"server_id": guild.id, "voice_channel_id": voice_channel.id}
+            )
+            if group is None:
+                return
 
         if len(voice_channel.members) == 0:
             # 如果頻道沒人，啟動計時器
+            if TimeoutOperation.is_pending(voice_channel.id):
+                return
+            now = utcnow()
+            if group.delete_deadline is None:
+                # 記錄刪除期限，重新啟動後從剩餘時間繼續倒數
+                group.delete_deadline = now + timedelta(seconds=GroupManager.AUTO_DELETE_TIMEOUT)
+                await Database.update(Group, Statements.SET_GROUP_DELETE_DEADLINE, {
+                    "owner": group.owner_id,
+                    "server": group.server_id,
+                    "voice_channel": group.voice_channel_id,
+                    "deadline": group.delete_deadline,
+                }, keys=[{"owner_id": group.owner_id}])
             await TimeoutOperation.start_timer(
                 channel=voice_channel,
-                timeout=60,  # 設定計時器為 60 秒
-                on_timeout=lambda: asyncio.create_task(
-                    GroupManager.delete(
-                        guild=guild,
-                        user_id=group.owner_id,
-                        group=group,
-                    )
+                timeout=max((group.delete_deadline - now).total_seconds(), 0),
+                on_timeout=functools.partial(
+                    GroupManager.delete,
+                    guild=guild,
+                    user_id=group.owner_id,
+                    group=group,
                 )
             )
         else:
             # 如果頻道有人，取消計時器
-            await TimeoutOperation.cancel_timer(channel_id=voice_channel.id)
\ No newline at end of file
+            await TimeoutOperation.cancel_timer(channel_id=voice_channel.id)
+            if group.delete_deadline is not None:
+                group.delete_deadline = None
+                await Database.update(Group, Statements.SET_GROUP_DELETE_DEADLINE, {
+                    "owner": group.owner_id,
+                    "server": group.server_id,
+                    "voice_channel": group.voice_channel_id,
+                    "deadline": None,
+                }, keys=[{"owner_id": group.owner_id}])
\ No newline at end of file
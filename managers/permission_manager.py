@@ -42,7 +42,7 @@ class PermissionManager:
         guild: discord.Guild,
         user: discord.Member,
         voice_channel: discord.VoiceChannel,
-        user_list: List[WhiteList],
+        user_list: frozenset[int],
     ) -> None:
         whitelist = user_list
         overwrites = {
@@ -57,7 +57,7 @@ class PermissionManager:
             ),
         }
         for white in whitelist:
-            white_user = guild.get_member(white.discord_id)
+            white_user = guild.get_member(white)
             if white_user:
                 overwrites[white_user] = discord.PermissionOverwrite(view_channel=True, connect=True)
         await voice_channel.edit(overwrites=overwrites)
@@ -66,7 +66,7 @@ class PermissionManager:
         guild: discord.Guild,
         user: discord.Member,
         voice_channel: discord.VoiceChannel,
-        user_list: List[BlackList],
+        user_list: frozenset[int],
     ) -> None:
         blacklist = user_list
         overwrites = {
@@ -81,7 +81,7 @@ class PermissionManager:
             ),
         }
         for black in blacklist:
-            black_user = guild.get_member(black.discord_id)
+            black_user = guild.get_member(black)
             if black_user:
                 overwrites[black_user] = discord.PermissionOverwrite(view_channel=True, connect=False)
         await voice_channel.edit(overwrites=overwrites)
@@ -109,8 +109,8 @@ class PermissionManager:
         guild: discord.Guild,
         user: discord.Member,
         voice_channel: discord.VoiceChannel,
-        white_list: List[WhiteList],
-        black_list: List[BlackList],
+        white_list: frozenset[int],
+        black_list: frozenset[int],
         limit_mode: int,
     ):
         """
@@ -137,16 +137,16 @@ class PermissionManager:
     @staticmethod
     def _white_list_check(
         user_id: int,
-        white_list: List[WhiteList],
+        white_list: frozenset[int],
     ) -> bool:
-        return  user_id in [user.discord_id for user in white_list]
+        return user_id in white_list
 
     @staticmethod
     def _black_list_check(
         user_id: int,
-        black_list: List[BlackList],
+        black_list: frozenset[int],
     ) -> bool:
-        return user_id in [user.discord_id for user in black_list]
+        return user_id in black_list
     
     @staticmethod
     def _password_check(
@@ -162,8 +162,8 @@ class PermissionManager:
         limit_mode: int,
         voice_channel: discord.VoiceChannel,
         parent: 'GroupManager',
-        white_list: Optional[List[WhiteList]] = None,
-        black_list: Optional[List[BlackList]] = None,
+        white_list: Optional[frozenset[int]] = None,
+        black_list: Optional[frozenset[int]] = None,
         password: Optional[str] = None,
     ) -> bool:
         """
@@ -14,6 +14,7 @@ from utility import config, LOG, EmbedTemplate
 
 
 from database import Database, WhiteList, BlackList, ServerConfiguration, Server, UserConfiguration, User, UserRecord, Group
+from managers.database_manager import DatabaseManager
 
 
 class CreateButtonView(discord.ui.View):
@@ -34,9 +35,16 @@ class CreateButtonView(discord.ui.View):
     )
     async def green(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
-            user_record = await Database.select_one(UserRecord, UserRecord.discord_id.is_(interaction.user.id))
-            user_config = await Database.select_one(UserConfiguration, UserConfiguration.discord_id.is_(interaction.user.id))
-            group = await Database.select_one(Group, Group.owner_id.is_(interaction.user.id))
+            filled_data = await DatabaseManager.fill_missing_data(
+                guild_id=interaction.guild.id,
+                user_id=interaction.user.id,
+                user_record=None,
+                user_config=None,
+                group=None,
+            )
+            user_record = filled_data.user_record
+            user_config = filled_data.user_config
+            group = filled_data.group
             if group is not None:
                 await interaction.response.send_message(
                     embed=EmbedTemplate.normal("你已經有一個揪團了，請先刪除舊的揪團。"), ephemeral=True
@@ -4,6 +4,7 @@ import discord
 import sqlalchemy
 from utility import LOG, EmbedTemplate
 from database import Database, UserConfiguration, UserRecord, Group
+from managers.database_manager import DatabaseManager
 
 
 class SettingGroupModal(discord.ui.Modal, title="設定揪團"):
@@ -90,7 +91,7 @@ class SettingGroupModal(discord.ui.Modal, title="設定揪團"):
         if self.game_password.value.strip() != "":
             user_record.game_password = self.game_password.value
         # 儲存資料
-        await Database.insert_or_replace(user_record)
+        await DatabaseManager.queue_data(user_record=user_record)
 
         try:
             await self.callback(
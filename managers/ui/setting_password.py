@@ -6,6 +6,7 @@ import discord
 from utility import LOG, EmbedTemplate
 
 from database import Database, WhiteList, BlackList, ServerConfiguration, Server, UserConfiguration, User, UserRecord, Group
+from managers.database_manager import DatabaseManager
 
 
 
@@ -32,7 +33,7 @@ class SettingPasswordModal(discord.ui.Modal, title="設定密碼"):
     async def on_submit(self, interaction: discord.Interaction):
         try:
             self.user_config.group_password = self.group_password.value
-            await Database.insert_or_replace(self.user_config)
+            await DatabaseManager.queue_data(user_config=self.user_config)
 
             if self.callback is None:
                 await interaction.response.send_message(
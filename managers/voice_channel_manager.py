@@ -1,10 +1,11 @@
-import discord
+import asyncio
+import time
 
-from database import WhiteList, BlackList
+import discord
 
-from typing import List
+from typing import Iterable
 
-from utility import LOG
+from utility import LOG, config
 class VoiceChannelOperator:
     @staticmethod    
     async def create_voice_channel(
@@ -79,35 +80,62 @@ class VoiceChannelManager(VoiceChannelOperator, VoiceChannelEnsurer):
 
 
 
+    @staticmethod
+    async def evict_members(
+        voice_channel: discord.VoiceChannel,
+        members: Iterable[discord.Member],
+    ) -> int:
+        """
+        並行將成員移出語音頻道，同時進行的請求數量不超過 `config.voice_evict_concurrency`，
+        速率限制由 discord.py 依各路由的 bucket 處理，回傳成功移出的人數
+
+        :param voice_channel: 語音頻道
+        :param members: 要移出的成員
+        """
+        members = list(members)
+        if not members:
+            return 0
+
+        semaphore = asyncio.Semaphore(config.voice_evict_concurrency)
+
+        async def evict(member: discord.Member) -> None:
+            async with semaphore:
+                await member.move_to(None)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(evict(member) for member in members), return_exceptions=True)
+        moved = 0
+        for member, result in zip(members, results):
+            if isinstance(result, Exception):
+                LOG.Error(f"移出使用者{LOG.User(member.id)}失敗: {result}")
+            else:
+                moved += 1
+        LOG.System(
+            f"頻道 {voice_channel.id} 移出 {moved}/{len(members)} 位成員，耗時 {time.perf_counter() - start:.2f}s"
+        )
+        return moved
+
     @staticmethod
     async def _whitelist(
         user: discord.Member,
         voice_channel: discord.VoiceChannel,
-        user_list: List[WhiteList],
+        user_list: frozenset[int],
     ) -> None:
-        members = voice_channel.members
-        discord_ids = [white_user.discord_id for white_user in user_list]
-
-        for member in members:
-            if member == user:
-                continue
-            if member.id not in discord_ids:
-                await member.move_to(None)
+        await VoiceChannelManager.evict_members(
+            voice_channel,
+            (member for member in voice_channel.members if member != user and member.id not in user_list),
+        )
 
     @staticmethod
     async def _blacklist(
         user: discord.Member,
         voice_channel: discord.VoiceChannel,
-        user_list: List[BlackList],
+        user_list: frozenset[int],
     ) -> None:
-        members = voice_channel.members
-        discord_ids = [black_user.discord_id for black_user in user_list]
-
-        for member in members:
-            if member == user:
-                continue
-            if member.id in discord_ids:
-                await member.move_to(None)
+        await VoiceChannelManager.evict_members(
+            voice_channel,
+            (member for member in voice_channel.members if member != user and member.id in user_list),
+        )
 
     
     @staticmethod
@@ -115,12 +143,10 @@ class VoiceChannelManager(VoiceChannelOperator, VoiceChannelEnsurer):
         user: discord.Member,
         voice_channel: discord.VoiceChannel,
     ) -> None:
-        members = voice_channel.members
-
-        for member in members:
-            if member == user:
-                continue
-            await member.move_to(None)
+        await VoiceChannelManager.evict_members(
+            voice_channel,
+            (member for member in voice_channel.members if member != user),
+        )
 
 
     @staticmethod
@@ -128,8 +154,8 @@ class VoiceChannelManager(VoiceChannelOperator, VoiceChannelEnsurer):
         guild: discord.Guild,
         user: discord.Member,
         voice_channel: discord.VoiceChannel,
-        white_list: List[WhiteList],
-        black_list: List[BlackList],
+        white_list: frozenset[int],
+        black_list: frozenset[int],
         limit_mode: int,
     ) -> None:
         if limit_mode == 1:
@@ -0,0 +1,63 @@
+"""`ActivityTracker` 的關閉流程，以假的交易取代資料庫"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import asyncio
+import contextlib
+
+from database import ActivityTracker
+
+
+class SlowTransaction:
+    """每次寫入等待 `delay` 秒，記錄寫入的使用者"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.written: list = []
+
+    @property
+    def session(self):
+        return self
+
+    async def execute(self, statement, parameters) -> None:
+        await asyncio.sleep(self.delay)
+        self.written.extend(row["user_id"] for row in parameters)
+
+    @contextlib.asynccontextmanager
+    async def __call__(self):
+        yield self
+
+
+def test_close_during_flush_keeps_activity():
+    async def run():
+        transaction = SlowTransaction(delay=0.2)
+        tracker = ActivityTracker(interval=0.01, transaction=transaction)
+        tracker.touch(1)
+        await asyncio.sleep(0.05)  # 定時寫入已開始，正在等待交易
+        await tracker.close()
+        return transaction, tracker
+
+    transaction, tracker = asyncio.run(run())
+    assert transaction.written == [1]
+    assert len(tracker) == 0
+
+
+def test_cancelled_flush_requeues_activity():
+    async def run():
+        transaction = SlowTransaction(delay=1)
+        tracker = ActivityTracker(interval=60, transaction=transaction)
+        tracker.touch(1)
+        flush = asyncio.create_task(tracker.flush())
+        await asyncio.sleep(0.05)
+        flush.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await flush
+        pending = len(tracker)
+        transaction.delay = 0
+        await tracker.close()
+        return transaction, pending
+
+    transaction, pending = asyncio.run(run())
+    assert pending == 1
+    assert transaction.written == [1]
@@ -0,0 +1,59 @@
+"""以 `EXPLAIN QUERY PLAN` 檢查 `Statements` 內的查詢都使用索引，新增或修改索引、查詢後若退化為全表掃描則失敗"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from sqlalchemy import event
+
+from database import Base, Statements
+
+FULL_SCAN_ALLOWED = {"USER_IDS"}
+"""本來就需要讀取整個 Table 的查詢"""
+
+PARAMETERS = {
+    "keys": [1, 2],
+    "cutoff": datetime(2000, 1, 1),
+    "limit": 10,
+}
+"""綁定參數的值，沒有列出的參數一律為 1"""
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = sqlalchemy.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _query_plan(engine: sqlalchemy.Engine, statement: sqlalchemy.Select) -> list[str]:
+    """執行查詢並回傳 SQLite 的查詢計畫，每個步驟一行"""
+    plan = []
+
+    def explain(conn, cursor, sql, parameters, context, executemany):
+        plan.extend(row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall())
+
+    parameters = {name: PARAMETERS.get(name, 1) for name in statement.compile().params}
+    event.listen(engine, "before_cursor_execute", explain)
+    try:
+        with engine.connect() as connection:
+            connection.execute(statement, parameters).all()
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+    return plan
+
+
+@pytest.mark.parametrize(
+    "name", [name for name, value in vars(Statements).items() if isinstance(value, sqlalchemy.Select)]
+)
+def test_statement_uses_index(engine, name):
+    plan = _query_plan(engine, getattr(Statements, name))
+    assert plan
+    if name in FULL_SCAN_ALLOWED:
+        return
+    scans = [step for step in plan if step.startswith("SCAN")]
+    assert not scans, f"{name} 使用全表掃描: {plan}"
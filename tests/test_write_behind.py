@@ -0,0 +1,59 @@
+"""`WriteBehindQueue` 的關閉流程，以假的交易取代資料庫"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import asyncio
+import contextlib
+
+from database import UserConfiguration, WriteBehindQueue
+
+
+class SlowTransaction:
+    """每次寫入等待 `delay` 秒，記錄寫入的物件"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.written: list = []
+
+    async def upsert(self, table, instances) -> None:
+        await asyncio.sleep(self.delay)
+        self.written.extend(instances)
+
+    @contextlib.asynccontextmanager
+    async def __call__(self):
+        yield self
+
+
+def test_close_during_flush_keeps_rows():
+    async def run():
+        transaction = SlowTransaction(delay=0.2)
+        queue = WriteBehindQueue(interval=0.01, max_pending=100, transaction=transaction)
+        queue.put(UserConfiguration(discord_id=1))
+        await asyncio.sleep(0.05)  # 定時寫入已開始，正在等待交易
+        await queue.close()
+        return transaction, queue
+
+    transaction, queue = asyncio.run(run())
+    assert [row.discord_id for row in transaction.written] == [1]
+    assert len(queue) == 0
+
+
+def test_cancelled_flush_requeues_rows():
+    async def run():
+        transaction = SlowTransaction(delay=1)
+        queue = WriteBehindQueue(interval=60, max_pending=100, transaction=transaction)
+        queue.put(UserConfiguration(discord_id=1))
+        flush = asyncio.create_task(queue.flush())
+        await asyncio.sleep(0.05)
+        flush.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await flush
+        pending = len(queue)
+        transaction.delay = 0
+        await queue.close()
+        return transaction, pending
+
+    transaction, pending = asyncio.run(run())
+    assert pending == 1
+    assert [row.discord_id for row in transaction.written] == [1]
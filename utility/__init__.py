@@ -2,4 +2,5 @@ from .config import config
 from .custom_log import LOG, ContextCommandLogger, SlashCommandLogger
 from .discord_ui_template import *
 from .steam_API import steam_API
-from .timeout_operation import TimeoutOperation
\ No newline at end of file
+from .timeout_operation import TimeoutOperation
+from .event_coalescer import EventCoalescer
\ No newline at end of file
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from .custom_log import LOG
+from .prometheus import Metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class EventCoalescer(Generic[K, V]):
+    """合併同一個 Key 在短時間內的事件，Key 的第一個事件進來後等待 `window` 秒，
+    期間的後續事件只更新值，視窗結束時以最後的值呼叫一次 `callback`
+
+    Parameters
+    ------
+    name: `str`
+        名稱，用於 Prometheus Metric 的 label
+    window: `float`
+        合併事件的時間（單位：秒）
+    callback: `Callable[[K, V], Awaitable[None]]`
+        視窗結束時呼叫，傳入 Key 與最後的值
+    """
+
+    def __init__(self, name: str, window: float, callback: Callable[[K, V], Awaitable[None]]) -> None:
+        self.name = name
+        self.window = window
+        self.callback = callback
+        self._pending: dict[K, V] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, key: K, value: V) -> None:
+        """送出一個事件，若該 Key 已在等待中則只更新值"""
+        Metrics.COALESCER_EVENTS.labels(self.name).inc()
+        if key not in self._pending:
+            asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        self._pending[key] = value
+
+    def _flush(self, key: K) -> None:
+        value = self._pending.pop(key)
+        Metrics.COALESCER_FLUSHES.labels(self.name).inc()
+        task = asyncio.create_task(self._run(key, value))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: K, value: V) -> None:
+        try:
+            await self.callback(key, value)
+        except Exception as e:
+            LOG.Error(f"{self.name}: 處理 {key} 的事件時發生錯誤: {e}")
@@ -49,3 +49,48 @@ class Metrics:
         PREFIX + "process_start_time_seconds", "機器人程序啟動時當下的時間"
     )
     """機器人程序啟動時當下的時間 (UNIX Timestamp)"""
+
+    COALESCER_EVENTS: Final[Counter] = Counter(PREFIX + "coalescer_events", "送進事件合併器的原始事件數量", ["coalescer"])
+    """送進事件合併器的原始事件數量"""
+
+    COALESCER_FLUSHES: Final[Counter] = Counter(
+        PREFIX + "coalescer_flushes", "事件合併器合併後實際處理的次數", ["coalescer"]
+    )
+    """事件合併器合併後實際處理的次數，與 `COALESCER_EVENTS` 的差為被合併掉的事件"""
+
+    DB_CACHE_HITS: Final[Counter] = Counter(PREFIX + "db_cache_hits", "資料庫讀取快取命中的次數", ["cache"])
+    """資料庫讀取快取命中的次數"""
+
+    DB_CACHE_MISSES: Final[Counter] = Counter(PREFIX + "db_cache_misses", "資料庫讀取快取未命中的次數", ["cache"])
+    """資料庫讀取快取未命中的次數"""
+
+    DB_CACHE_EVICTIONS: Final[Counter] = Counter(
+        PREFIX + "db_cache_evictions", "資料庫讀取快取因容量上限淘汰資料的次數", ["cache"]
+    )
+    """資料庫讀取快取因容量上限淘汰資料的次數"""
+
+    DB_LOADER_KEYS: Final[Counter] = Counter(PREFIX + "db_loader_keys", "DataLoader 收到的查詢請求次數", ["loader"])
+    """DataLoader 收到的查詢請求次數"""
+
+    DB_LOADER_COALESCED: Final[Counter] = Counter(
+        PREFIX + "db_loader_coalesced", "DataLoader 與進行中的查詢合併的請求次數", ["loader"]
+    )
+    """DataLoader 與進行中的查詢合併的請求次數"""
+
+    DB_LOADER_BATCHES: Final[Counter] = Counter(PREFIX + "db_loader_batches", "DataLoader 實際送出的批次查詢次數", ["loader"])
+    """DataLoader 實際送出的批次查詢次數"""
+
+    DB_USERS_PRUNED: Final[Counter] = Counter(PREFIX + "db_users_pruned", "因過期被刪除的使用者數量")
+    """因過期被刪除的使用者數量"""
+
+    DB_TABLE_ROWS: Final[Gauge] = Gauge(PREFIX + "db_table_rows", "資料表的資料筆數", ["table"])
+    """資料表的資料筆數，於清理過期使用者後更新"""
+
+    DB_WRITE_BEHIND_PENDING: Final[Gauge] = Gauge(PREFIX + "db_write_behind_pending", "延遲寫入佇列內等待寫入的資料筆數")
+    """延遲寫入佇列內等待寫入的資料筆數"""
+
+    DB_WRITE_BEHIND_QUEUED: Final[Counter] = Counter(PREFIX + "db_write_behind_queued", "放入延遲寫入佇列的次數")
+    """放入延遲寫入佇列的次數，與 `DB_WRITE_BEHIND_FLUSHED` 的差為合併掉的寫入"""
+
+    DB_WRITE_BEHIND_FLUSHED: Final[Counter] = Counter(PREFIX + "db_write_behind_flushed", "延遲寫入佇列實際寫入資料庫的筆數")
+    """延遲寫入佇列實際寫入資料庫的筆數"""
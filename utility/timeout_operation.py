@@ -1,57 +1,155 @@
-from collections import defaultdict
 import asyncio
+import heapq
+import itertools
 import discord
-from typing import Optional, Callable
+from typing import Awaitable, Callable, Hashable, Optional
+
+from .custom_log import LOG
 
 
 class TimeoutOperation:
-    # 用於追蹤語音頻道的計時任務
-    voice_channel_tasks = defaultdict(lambda: None)
+    """以單一排程協程管理所有計時器，計時器存放在以到期時間排序的 min-heap，
+    排程、取消、重新排程皆為 O(log n)，排程協程只在最早到期的計時器到期時被喚醒，
+    被取消的計時器只做標記，數量超過一半時整理 heap，頻繁建立與取消也不會讓記憶體無限增長
+    """
+
+    COMPACT_THRESHOLD = 64
+    """被取消的計時器超過此數量且超過 heap 的一半時整理 heap"""
+
+    _heap: list[list] = []
+    """計時器 [到期時間, 序號, Key, 回調函數]，回調函數為 None 表示已取消"""
+    _timers: dict[Hashable, list] = {}
+    """Key 對應的計時器"""
+    _counter = itertools.count()
+    _cancelled = 0
+    _wakeup: Optional[asyncio.Event] = None
+    _scheduler: Optional[asyncio.Task] = None
+    _running: set[asyncio.Task] = set()
+    """執行中的回調函數"""
+
+    @classmethod
+    def schedule(cls, key: Hashable, delay: float, callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        在 `delay` 秒後執行 `callback`，若該 Key 已有計時器則取代
+
+        :param key: 計時器的 Key，例：語音頻道 ID
+        :param delay: 計時器的時間（秒）
+        :param callback: 計時結束後的回調函數
+        """
+        cls.cancel(key)
+        loop = asyncio.get_running_loop()
+        timer = [loop.time() + delay, next(cls._counter), key, callback]
+        cls._timers[key] = timer
+        heapq.heappush(cls._heap, timer)
+
+        if cls._scheduler is None or cls._scheduler.done():
+            cls._wakeup = asyncio.Event()
+            cls._scheduler = asyncio.create_task(cls._run())
+        elif cls._heap[0] is timer:
+            # 新的計時器比目前等待中的更早到期，才需要喚醒排程協程
+            cls._wakeup.set()
+
+    @classmethod
+    def cancel(cls, key: Hashable) -> bool:
+        """取消計時器，回傳是否有計時器被取消"""
+        timer = cls._timers.pop(key, None)
+        if timer is None:
+            return False
+        timer[3] = None
+        cls._cancelled += 1
+        if cls._cancelled > cls.COMPACT_THRESHOLD and cls._cancelled * 2 > len(cls._heap):
+            cls._heap = [timer for timer in cls._heap if timer[3] is not None]
+            heapq.heapify(cls._heap)
+            cls._cancelled = 0
+        return True
+
+    @classmethod
+    def reschedule(cls, key: Hashable, delay: float) -> bool:
+        """以相同的回調函數重新計時 `delay` 秒，回傳該 Key 是否有計時器"""
+        timer = cls._timers.get(key)
+        if timer is None:
+            return False
+        cls.schedule(key, delay, timer[3])
+        return True
+
+    @classmethod
+    def is_pending(cls, key: Hashable) -> bool:
+        """該 Key 是否有尚未到期的計時器"""
+        return key in cls._timers
+
+    @classmethod
+    def pending(cls) -> dict[Hashable, float]:
+        """所有尚未到期的計時器，{Key: 剩餘秒數}"""
+        now = asyncio.get_running_loop().time()
+        return {key: timer[0] - now for key, timer in cls._timers.items()}
+
+    @classmethod
+    def _pop_cancelled(cls) -> None:
+        while cls._heap and cls._heap[0][3] is None:
+            heapq.heappop(cls._heap)
+            cls._cancelled -= 1
+
+    @classmethod
+    async def _run(cls) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            cls._wakeup.clear()
+            cls._pop_cancelled()
+            if not cls._heap:
+                await cls._wakeup.wait()
+                continue
+
+            delay = cls._heap[0][0] - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(cls._wakeup.wait(), delay)
+                except TimeoutError:
+                    pass
+                continue
+
+            _, _, key, callback = heapq.heappop(cls._heap)
+            del cls._timers[key]
+            task = asyncio.create_task(cls._fire(key, callback))
+            cls._running.add(task)
+            task.add_done_callback(cls._running.discard)
 
     @staticmethod
+    async def _fire(key: Hashable, callback: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await callback()
+        except Exception as e:
+            # 處理回調函數中的異常
+            LOG.Error(f"計時器 {key} 的回調函數發生錯誤: {e}")
+
+    @classmethod
     async def start_timer(
+        cls,
         channel: discord.VoiceChannel,
         timeout: int,
-        on_timeout: Callable[[], None],
+        on_timeout: Callable[[], Awaitable[None]],
     ):
         """
-        啟動計時器，當計時結束後執行 `on_timeout`。
+        啟動計時器，當計時結束後若頻道仍沒人，執行 `on_timeout`。
 
         :param channel: Discord 語音頻道
         :param timeout: 計時器的時間（秒）
         :param on_timeout: 計時結束後的回調函數
         """
-        if TimeoutOperation.voice_channel_tasks[channel.id] is not None:
+        if cls.is_pending(channel.id):
             # 如果已有計時器，直接返回
             return
 
-        async def timer_task():
-            try:
-                await asyncio.sleep(timeout)  # 等待指定的時間
-                if len(channel.members) == 0:  # 再次確認頻道是否沒人
-                    try:
-                        await on_timeout()
-                    except Exception as e:
-                        # 處理回調函數中的異常
-                        print(f"Error in on_timeout: {e}")
-            except asyncio.CancelledError:
-                # 如果計時器被取消，直接退出
-                pass
-            finally:
-                # 確保任務結束後清除記錄
-                TimeoutOperation.voice_channel_tasks[channel.id] = None
-
-        # 啟動計時器任務
-        TimeoutOperation.voice_channel_tasks[channel.id] = asyncio.create_task(timer_task())
+        async def callback():
+            if len(channel.members) == 0:  # 再次確認頻道是否沒人
+                await on_timeout()
 
-    @staticmethod
-    async def cancel_timer(channel_id: int):
+        cls.schedule(channel.id, timeout, callback)
+
+    @classmethod
+    async def cancel_timer(cls, channel_id: int):
         """
         取消計時器。
 
         :param channel_id: 語音頻道的 ID
         """
-        task = TimeoutOperation.voice_channel_tasks.get(channel_id)
-        if task is not None:
-            task.cancel()
-            TimeoutOperation.voice_channel_tasks[channel_id] = None
\ No newline at end of file
+        cls.cancel(channel_id)